@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+"""
+    dir_size_history.py: The history of the size of each dir of a tree
+"""
+
+#==============================================================================
+# A time series of the size of each directory of a tree, stored in a sqlite
+# database. Each run of the monitor only adds a point for the directories
+# whose size has changed since the last run (the diff of two snapshots), thus
+# the size of a directory at any time is its last point until then, and a
+# deleted directory has a last point without size. A query of the growth of
+# a directory, or of the directories that have grown most in a lapse, only
+# reads the points of that lapse and the last one before it, by the indexes.
+#
+# Old points are downsampled under a retention policy: below each age, only
+# the last point of each directory in each step (e.g. a day) is kept. Beyond
+# the last age only the last point of each directory is kept, or none if it
+# has been deleted.
+#==============================================================================
+
+#==============================================================================
+#    Copyright 2026 joe di castro <joe@joedicastro.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#==============================================================================
+
+__author__ = "joe di castro <joe@joedicastro.com>"
+__license__ = "GNU General Public License version 3"
+__date__ = "18/10/2026"
+__version__ = "0.1"
+
+try:
+    import sys
+    import os
+    import sqlite3
+    import time
+    try:
+        from os import fsencode, fsdecode
+    except ImportError:
+        # Python 2, the paths are already bytes
+        fsencode = fsdecode = str
+except ImportError:
+    # Checks the installation of the necessary python modules
+    print((os.linesep * 2).join(["An error found importing one module:",
+          str(sys.exc_info()[1]), "You need to install it", "Stopping..."]))
+    sys.exit(-2)
+
+
+DAY = 24 * 60 * 60
+
+# The default retention policy: all the points of the last week, one a day
+# until three months and one a week until two years
+RETENTION = ((7 * DAY, DAY), (90 * DAY, 7 * DAY), (730 * DAY, None))
+
+
+class SizeHistory:
+    """Create a SizeHistory object that stores the sizes of dirs over time.
+
+    The history is a sqlite database. The times are seconds since the epoch
+    (as from time.time()) and the directories are stored with the same path
+    that was used to walk them.
+
+    """
+
+    def __init__(self, filename=".dir_sizes_history.db"):
+        """Create the object SizeHistory itself & open (or create) the db.
+
+        (str) filename -- The file of the sqlite database
+
+        """
+        self.filename = filename
+        self.__db = sqlite3.connect(filename)
+        self.__db.executescript("""
+            CREATE TABLE IF NOT EXISTS dirs (id INTEGER PRIMARY KEY,
+                                             path BLOB UNIQUE);
+            CREATE TABLE IF NOT EXISTS points (dir INTEGER, time INTEGER,
+                                               bytes INTEGER,
+                                               PRIMARY KEY (dir, time))
+                                               WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS points_time ON points (time);
+            CREATE TABLE IF NOT EXISTS runs (time INTEGER PRIMARY KEY,
+                                             bytes INTEGER);
+            """)
+
+    def append(self, when, changes, root_bytes=None):
+        """Add the sizes of the directories changed in a run.
+
+        (int) when -- The time of the run
+        (iterable) changes -- The (path, size before, size now) of each
+                              directory changed, like DirSnapshot.diff. The
+                              size now is None for the deleted ones
+        (int) root_bytes -- The size of the whole tree in the run
+
+        """
+        when = int(when)
+        changes = [(sqlite3.Binary(fsencode(path)), size)
+                   for path, _, size in changes]
+        with self.__db:
+            self.__db.executemany("INSERT OR IGNORE INTO dirs (path) "
+                                  "VALUES (?)", ((path,) for path, _ in
+                                                 changes))
+            self.__db.executemany("INSERT OR REPLACE INTO points VALUES ("
+                                  "(SELECT id FROM dirs WHERE path = ?), ?, "
+                                  "?)", ((path, when, size)
+                                         for path, size in changes))
+            self.__db.execute("INSERT OR REPLACE INTO runs VALUES (?, ?)",
+                              (when, root_bytes))
+
+    def downsample(self, now=None, retention=RETENTION):
+        """Remove the old points under a retention policy.
+
+        (int) now -- The time the ages are from (by default, now)
+        (tuple) retention -- The (age, step) of each tier, the youngest
+                             first. The points older than age are reduced to
+                             the last one of each directory in each step, or
+                             in the whole tier if step is None
+
+        """
+        now = int(time.time() if now is None else now)
+        ages = [age for age, _ in retention] + [None]
+        with self.__db:
+            for (age, step), older in zip(retention, ages[1:]):
+                end = now - age
+                start = now - older if older is not None else None
+                bucket = "AND later.time / {0:d} = points.time / {0:d}".\
+                    format(step) if step else ""
+                self.__db.execute(
+                    "DELETE FROM points WHERE time < :end AND time >= "
+                    "IFNULL(:start, time) AND EXISTS (SELECT 1 FROM points "
+                    "AS later WHERE later.dir = points.dir AND later.time > "
+                    "points.time AND later.time < :end {0})".format(bucket),
+                    {"start": start, "end": end})
+            # The directories deleted before the last tier are forgotten
+            oldest = now - retention[-1][0]
+            self.__db.execute("DELETE FROM points WHERE time < ? AND bytes IS "
+                              "NULL", (oldest,))
+            self.__db.execute("DELETE FROM runs WHERE time < ?", (oldest,))
+            self.__db.execute("DELETE FROM dirs WHERE id NOT IN (SELECT "
+                              "DISTINCT dir FROM points)")
+
+    def first_run(self):
+        """Get the time of the oldest run kept, None if there is none."""
+        return self.__db.execute("SELECT MIN(time) FROM runs").fetchone()[0]
+
+    def size_at(self, path, when):
+        """Get the size of a directory at a time, None if it didn't exist."""
+        row = self.__db.execute("SELECT bytes FROM points WHERE dir = (SELECT "
+                                "id FROM dirs WHERE path = ?) AND time <= ? "
+                                "ORDER BY time DESC LIMIT 1",
+                                (sqlite3.Binary(fsencode(path)), int(when))).\
+            fetchone()
+        return row[0] if row else None
+
+    def series(self, path, since=0, until=None):
+        """Get the (time, size) of the points of a directory in a lapse.
+
+        The first one is its size at since. The size is None while the
+        directory doesn't exist.
+
+        """
+        until = int(time.time() if until is None else until)
+        points = [(int(since), self.size_at(path, since))]
+        points.extend(self.__db.execute(
+            "SELECT time, bytes FROM points WHERE dir = (SELECT id FROM dirs "
+            "WHERE path = ?) AND time > ? AND time <= ? ORDER BY time",
+            (sqlite3.Binary(fsencode(path)), int(since), until)))
+        return points
+
+    def growth(self, path, since, until=None):
+        """Get the bytes a directory has grown (or shrunk) in a lapse."""
+        until = time.time() if until is None else until
+        return ((self.size_at(path, until) or 0) -
+                (self.size_at(path, since) or 0))
+
+    def top_growers(self, since, until=None, top_n=10, shrink=False):
+        """Get the directories that have grown most in a lapse.
+
+        Return a list of (bytes grown, path), largest first. Only the
+        directories changed in the lapse are compared.
+
+        (bool) shrink -- Get those that have shrunk most instead
+
+        """
+        until = int(time.time() if until is None else until)
+        rows = self.__db.execute(
+            "SELECT IFNULL((SELECT bytes FROM points WHERE dir = changed.dir "
+            "AND time <= :until ORDER BY time DESC LIMIT 1), 0) - IFNULL(("
+            "SELECT bytes FROM points WHERE dir = changed.dir AND time <= "
+            ":since ORDER BY time DESC LIMIT 1), 0) AS grown, path FROM "
+            "(SELECT DISTINCT dir FROM points WHERE time > :since AND time <= "
+            ":until) AS changed JOIN dirs ON dirs.id = changed.dir WHERE "
+            "grown {0} 0 ORDER BY grown {1} LIMIT :top".format(
+                "<" if shrink else ">", "" if shrink else "DESC"),
+            {"since": int(since), "until": until, "top": top_n})
+        return [(grown, fsdecode(bytes(path))) for grown, path in rows]
+
+    def close(self):
+        """Close the database."""
+        self.__db.close()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+"""
+    dir_size_metrics.py: Serve the size of dirs as Prometheus metrics
+"""
+
+#==============================================================================
+# A small HTTP endpoint (/metrics) with the size of the directories of the
+# last snapshot of a tree and the figures of the walk that made it, in the
+# Prometheus text format. The metrics are made once for each snapshot, thus a
+# scrape only sends them, it never walks the tree nor reads the disk. Only the
+# directories up to a depth are exposed, a metric for each directory of a
+# huge tree would be too much for Prometheus.
+#
+# The server runs in its own thread, made for the daemon mode of
+# dir_size_monitor.py. Run as a script, it serves the last snapshot saved by
+# dir_size_monitor.py (.dir_sizes.snap) instead, loaded again each time it's
+# replaced, for the runs from cron. Only for Python 3
+#==============================================================================
+
+#==============================================================================
+#    Copyright 2026 joe di castro <joe@joedicastro.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#==============================================================================
+
+__author__ = "joe di castro <joe@joedicastro.com>"
+__license__ = "GNU General Public License version 3"
+__date__ = "18/10/2026"
+__version__ = "0.1"
+
+try:
+    import sys
+    import os
+    import threading
+    import time
+    from argparse import ArgumentParser
+    from dir_snapshot import DirSnapshot
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    # Checks the installation of the necessary python modules
+    print((os.linesep * 2).join(["An error found importing one module:",
+          str(sys.exc_info()[1]), "You need to install it", "Stopping..."]))
+    sys.exit(-2)
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label(value):
+    """Escape a value of a label, as the text format requires."""
+    return (value.encode("utf-8", "backslashreplace").decode("utf-8").
+            replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+
+
+def render(snapshot, max_depth=1):
+    """Get the metrics of a snapshot in the Prometheus text format.
+
+    (DirSnapshot) snapshot -- The sizes of the directories, and the figures
+                              of the scan that made it
+    (int) max_depth -- The depth of the deepest directories exposed
+
+    """
+    duration, entries = snapshot.duration, snapshot.entries
+    root = _label(snapshot.root)
+    lines = ["# HELP dir_size_bytes The size in bytes of a directory tree.",
+             "# TYPE dir_size_bytes gauge"]
+    lines.extend('dir_size_bytes{{root="{0}",path="{1}"}} {2:d}'.format(
+        root, _label(path), size) for path, size in
+        snapshot.walk(max_depth))
+    for name, kind, text, value in (
+            ("directories", "gauge", "The directories of the tree.",
+             len(snapshot)),
+            ("scan_duration_seconds", "gauge", "The seconds of the last "
+             "scan.", duration),
+            ("scan_entries", "gauge", "The entries (files & directories) of "
+             "the last scan.", entries),
+            ("scan_entries_per_second", "gauge", "The entries per second of "
+             "the last scan.", entries / max(duration, 1e-9)),
+            ("scan_timestamp_seconds", "gauge", "The time of the last scan.",
+             snapshot.when)):
+        lines.extend(["# HELP dir_size_{0} {1}".format(name, text),
+                      "# TYPE dir_size_{0} {1}".format(name, kind),
+                      'dir_size_{0}{{root="{1}"}} {2!r}'.format(name, root,
+                                                                value)])
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Send the last metrics of the server on GET /metrics."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Do not log each scrape."""
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    """An HTTP server with a thread for each request."""
+    daemon_threads = True
+
+
+class MetricsServer:
+    """Create a MetricsServer object that serves the metrics of snapshots.
+
+    The server starts at once, in its own thread, without metrics until the
+    first update.
+
+    """
+
+    def __init__(self, port=9101, host="127.0.0.1", max_depth=1):
+        """Create the object MetricsServer itself & start to serve.
+
+        (int) port -- The TCP port to listen
+        (str) host -- The address to listen, only local by default
+        (int) max_depth -- The depth of the deepest directories exposed
+
+        """
+        self.max_depth = max_depth
+        self.__server = _Server((host, port), _Handler)
+        self.__server.metrics = b""
+        self.port = self.__server.server_address[1]
+        threading.Thread(target=self.__server.serve_forever,
+                         daemon=True).start()
+
+    def update(self, snapshot):
+        """Serve the metrics of a new snapshot (see render)."""
+        self.__server.metrics = render(snapshot, self.max_depth)
+
+    def close(self):
+        """Stop the server."""
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+def arguments():
+    """Defines the command line arguments for the script."""
+    main_desc = """Serve the last snapshot of dir_size_monitor as metrics"""
+
+    parser = ArgumentParser(description=main_desc)
+    parser.add_argument("snapshot", default=".dir_sizes.snap", nargs="?",
+                        help="the snapshot file (.dir_sizes.snap by default)")
+    parser.add_argument("-p", "--port", type=int, default=9101,
+                        help="the TCP port to listen (9101 by default)")
+    parser.add_argument("-H", "--host", default="127.0.0.1",
+                        help="the address to listen (127.0.0.1 by default)")
+    parser.add_argument("-d", "--depth", type=int, default=1,
+                        help="the depth of the deepest directories in the "
+                        "metrics (1 by default)")
+    parser.add_argument("-v", "--version", action="version",
+                        version="%(prog)s {0}".format(__version__),
+                        help="show program's version number and exit")
+    return parser
+
+
+def main():
+    """Main section"""
+    args = arguments().parse_args()
+    server = MetricsServer(args.port, args.host, args.depth)
+    loaded = None
+    try:
+        while True:
+            # The snapshot file is replaced at once, a new one has a new inode
+            try:
+                snap_stat = os.stat(args.snapshot)
+                current = (snap_stat.st_ino, snap_stat.st_mtime_ns)
+                if current != loaded:
+                    server.update(DirSnapshot.load(args.snapshot))
+                    loaded = current
+            except (OSError, ValueError) as err:
+                print(err)
+            time.sleep(5)
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-#!/usr/bin/env python2
+#!/usr/bin/env python3
 # -*- coding: utf8 -*-
 
 """
@@ -8,13 +8,13 @@
 #==============================================================================
 # This Script monitors the changes in disk size for the directories included in
 # a given path. It reports what directories are new or deleted. Also reports
-# the directories in which their size increases or decreases above threshold
-# values.  These threshold values refer to the amount in difference of size of
-# the directory or/and the percentage difference. These values can be overrided
-# by setting them to zero.
+# the directories whose size increases or decreases unusually for them, by a
+# model of the usual growth of each directory, learned from the previous runs
+# and kept in the snapshot (see DirSnapshot.learn). Its parameters are options
+# of the command line.
 #
 # The final report is sended via email to the local user. This script is
-# intended to run periodically (e.g. via cron)
+# intended to run periodically (e.g. via cron). Only for Python 3.3+
 #==============================================================================
 
 #==============================================================================
@@ -37,16 +37,21 @@
 __author__ = "joe di castro <joe@joedicastro.com>"
 __license__ = "GNU General Public License version 3"
 __date__ = "21/11/2012"
-__version__ = "0.4"
+__version__ = "0.5"
 
 try:
     import logger
+    import errno
     import os
-    import pickle
     import platform
+    import signal
     import sys
+    import time
     from argparse import ArgumentParser
-    from get_size import best_unit_size, get_size_fast
+    from dir_size_history import SizeHistory, DAY
+    from dir_snapshot import DirSnapshot
+    from get_size import (best_unit_size, best_unit_sizes, PruneRules,
+                          ScanCheckpoint, SizeCache, TopSizes, walk_resumable)
     from notify import notify
 except ImportError:
     # Checks the installation of the necessary python modules
@@ -63,6 +68,57 @@ def arguments():
     parser.add_argument("path", default=os.path.expanduser('~'), nargs='?',
                         help="The path to monitor. If none is given, takes the"
                         " home directory")
+    parser.add_argument("-c", "--cache", action="store_true",
+                        help="reuse the directories not modified since the "
+                        "last run (.dir_sizes.db). Files that grow in place "
+                        "are not seen until their directory changes")
+    parser.add_argument("-t", "--top", type=int, default=10,
+                        help="report the TOP largest files and directories "
+                        "(10 by default, 0 to not report them)")
+    parser.add_argument("-e", "--exclude", action="append", default=[],
+                        help="do not walk the entries that match this glob "
+                        "pattern (by name, or by path if it has a '/'). Can "
+                        "be repeated")
+    parser.add_argument("-d", "--max-depth", type=int, default=None,
+                        help="do not walk the directories below this depth")
+    parser.add_argument("-x", "--one-file-system", action="store_true",
+                        help="do not walk the directories in other "
+                        "filesystems")
+    parser.add_argument("-k", "--checkpoint", action="store_true",
+                        help="save the progress of the walk each minute "
+                        "(.dir_sizes.ckpt), a run killed or stopped goes on "
+                        "from there the next time")
+    parser.add_argument("--checkpoint-age", type=float, default=24,
+                        metavar="HOURS",
+                        help="with --checkpoint, start again a walk stopped "
+                        "that started more than HOURS ago (24 by default)")
+    parser.add_argument("-D", "--daemon", type=float, metavar="SECONDS",
+                        help="keep running and report each SECONDS. The path "
+                        "is walked once and then kept up to date from the "
+                        "inotify events (Linux only)")
+    parser.add_argument("-m", "--metrics", type=int, metavar="PORT",
+                        help="with --daemon, serve the sizes of the last "
+                        "report as Prometheus metrics in "
+                        "http://localhost:PORT/metrics. Without it, serve "
+                        "them with dir_size_metrics.py")
+    parser.add_argument("--metrics-depth", type=int, default=1,
+                        help="the depth of the deepest directories in the "
+                        "metrics (1 by default)")
+    parser.add_argument("--alpha", type=float, default=0.1,
+                        help="the weight of the last run in the model of the "
+                        "growth of each directory, from 0 to 1 (0.1 by "
+                        "default). The higher, the sooner it forgets")
+    parser.add_argument("--sigmas", type=float, default=4.0,
+                        help="report the growths this many standard "
+                        "deviations away from the usual one of their "
+                        "directory (4 by default)")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="the runs the model of a directory needs to be "
+                        "trusted, until then any change of MIN_CHANGE is "
+                        "reported (5 by default)")
+    parser.add_argument("--min-change", type=float, default=10 * 2 ** 20,
+                        help="ignore the changes of less than these bytes "
+                        "(10 MiB by default)")
     parser.add_argument("-v", "--version", action="version",
                         version="%(prog)s {0}".format(__version__),
                         help="show program's version number and exit")
@@ -71,40 +127,54 @@ def arguments():
 
 def list4log(dirs_size_dict, wpath, dirs):
     """Create a list of new or deleted directories for the log."""
-    llst = []
-    for ldir in sorted(dirs):
-        dsz = best_unit_size(dirs_size_dict[ldir])
-        llst.append(" {0:8.2f} {1}   ./{2}".
-                    format(dsz['s'], dsz['u'], os.path.relpath(ldir, wpath)))
-    return llst
-
-
-def diff4log(before, current, wpath, dirs, threshold_pct=0, threshold_sz=0):
-    """Create a list of the directories that had size changes for the log."""
-    llst = []
-    for ddir in sorted(dirs):
-        pct = (((current[ddir] - float(before[ddir])) / before[ddir]) * 100.0)
-        diff = current[ddir] - before[ddir]
-        if abs(pct) >= threshold_pct and abs(diff) > threshold_sz:
-            dsz = best_unit_size(diff)
-            llst.append(" {0:8.2f} % {1:8.1f} {2}   ./{3}".
-                        format(pct, dsz['s'], dsz['u'],
-                               os.path.relpath(ddir, wpath)))
-    return llst
+    dirs = sorted(dirs)
+    sizes, units = best_unit_sizes([dirs_size_dict[ldir] for ldir in dirs])
+    return [" {0:8.2f} {1}   ./{2}".format(size, unit,
+                                           os.path.relpath(ldir, wpath))
+            for ldir, size, unit in zip(dirs, sizes, units)]
 
 
-def main(first_exec=False):
-    """Main section"""
+def top4log(top_sizes, wpath):
+    """Create a list of the largest files or directories for the log."""
+    sizes, units = best_unit_sizes([size for size, _ in top_sizes])
+    return [" {0:8.2f} {1}   ./{2}".format(size, unit,
+                                           os.path.relpath(path, wpath))
+            for (_, path), size, unit in zip(top_sizes, sizes, units)]
 
-    # The path to monitor changes in directories dir_size. By default, if none
-    # is given, takes the home directory.
-    args = arguments().parse_args()
-    mon_pth = args.path
 
-    # Ignore all directories that are below these percentage or absolute value
-    # of size difference. There are optional, set to zero to override them.
-    thld_pct = 20       # In percentage of difference in size for a directory
-    thld_sz = 10.486E6  # In bytes of absolute value of directory size diff.
+def diff4log(unusual, wpath):
+    """Create a list of the directories with unusual changes for the log."""
+    rows = [(ddir, (current - float(before)) / before * 100.0 if before
+             else 0.0, current - before, sigmas)
+            for ddir, before, current, sigmas in unusual]
+    sizes, units = best_unit_sizes([diff for _, _, diff, _ in rows])
+    return [" {0:8.2f} % {1:8.1f} {2} {3:>7}   ./{4}".
+            format(pct, size, unit, "" if sigmas is None else
+                   "{0:+.1f} sd".format(sigmas), os.path.relpath(ddir, wpath))
+            for (ddir, pct, _, sigmas), size, unit in zip(rows, sizes, units)]
+
+
+def check(mon_pth, snapshot, top_n, first_exec=False, metrics=None,
+          model=None):
+    """Report the changes in size of dirs since the last check & save them.
+
+    (str) mon_pth -- The path monitored
+    (function) snapshot -- Get the current DirSnapshot of the path, called
+                           with a TopSizes to keep the largest files & dirs
+    (int) top_n -- The number of the largest files & dirs to report
+    (MetricsServer) metrics -- Serve the current sizes as metrics
+    (dict) model -- The parameters of the model of the growth of each
+                    directory (see DirSnapshot.learn)
+
+    """
+
+    # Only the changed directories whose growth is unusual for them are
+    # reported, by the model of the growth of each one kept in the snapshot
+    model = model or dict(alpha=0.1, sigmas=4.0, warmup=5,
+                          min_change=10 * 2 ** 20)
+    # Report too the directories that have grown most in these last days,
+    # from the history of all the runs, whatever their thresholds
+    growth_days = 30
 
     # Prepare the log
     log = logger.Logger()
@@ -115,49 +185,78 @@ def main(first_exec=False):
     log.time("START TIME")
     notify("Directory Size Monitor", "Start to check", "info")
 
-    # Load the last dictionary of directories/sizes if exists
+    # Load the last snapshot of directories/sizes if exists (of the same
+    # path). Only the parts of the file needed are read
     try:
-        with open('.dir_sizes.pkl', 'rb') as input_file:
-            bfr_dir = pickle.load(input_file)
-    except (EOFError, IOError, pickle.PickleError):
-        bfr_dir = {}
+        bfr_dir = DirSnapshot.load(".dir_sizes.snap")
+    except (IOError, OSError, ValueError):
+        bfr_dir = None
+    if bfr_dir is None or bfr_dir.root != mon_pth:
+        bfr_dir = DirSnapshot(mon_pth)
         first_exec = True
 
-    # Get the current dictionary of directories/sizes
-    crr_dir = {}
-    for path, dirs, files in os.walk(mon_pth):
-        for directory in dirs:
-            dir_path = os.path.join(path, directory)
-            dir_size = get_size_fast(dir_path)
-            crr_dir[dir_path] = dir_size
+    # Get the current snapshot of directories/sizes, all in a single pass. The
+    # monitored path itself is only reported in the statistics
+    top = TopSizes(top_n)
+    crr_dir = snapshot(top)
+    if metrics:
+        metrics.update(crr_dir)
+    mon_pth_bytes = crr_dir[mon_pth]
 
-    # First, Save the current dirs/sizes
-    with open(".dir_sizes.pkl", "wb") as output_file:
-        pickle.dump(crr_dir, output_file)
+    # Create the list depending the status of directories, comparing both
+    # snapshots in a single sorted pass
+    deleted, added = [], []
+    changes = list(crr_dir.diff(bfr_dir))
+    for ddir, before, current in changes:
+        if ddir == mon_pth:
+            continue
+        elif current is None:
+            deleted.append(ddir)
+        elif before is None:
+            added.append(ddir)
+    # And update the model of each directory with its growth, the snapshot
+    # saved keeps it for the next run
+    unusual = [change for change in crr_dir.learn(bfr_dir, **model)
+               if change[0] != mon_pth]
 
-    # Create the list depending the status of directories
-    deleted = [d for d in bfr_dir if d not in crr_dir]
-    added = [d for d in crr_dir if d not in bfr_dir]
-    changed = [d for d in crr_dir if d in bfr_dir if crr_dir[d] != bfr_dir[d]]
+    # Then, Save the current dirs/sizes, the last ones are replaced at once,
+    # and add the changes to the history
+    crr_dir.save(".dir_sizes.snap")
+    now = time.time()
+    history = SizeHistory(".dir_sizes_history.db")
+    history.append(now, changes, mon_pth_bytes)
+    history.downsample(now)
+    # Since the first run if the history is younger, and without the path
+    # monitored itself
+    since = max(now - growth_days * DAY, history.first_run())
+    growers = [(grown, ddir) for grown, ddir in
+               history.top_growers(since, now, top_n + 1)
+               if ddir != mon_pth][:top_n]
+    history.close()
 
     log.list("Deleted directories", list4log(bfr_dir, mon_pth, deleted))
     log.list("New directories", list4log(crr_dir, mon_pth, added))
-    log.list("Changed directories", diff4log(bfr_dir, crr_dir, mon_pth,
-                                             changed, thld_pct, thld_sz))
-
-    # If thresholds are nonzero, then report the values
-    if thld_pct or thld_sz:
-        tsz = best_unit_size(thld_sz)
-        log.list("Threshold Values",
-                 ["The directories whose size differences are less than any of"
-                  " these values are ignored:", "",
-                  "Percentage: {0:6} %".format(thld_pct),
-                  "Size:       {0:6.2f} {1}".format(tsz['s'], tsz['u'])])
+    log.list("Unusual changes", diff4log(unusual, mon_pth))
+
+    # The largest consumers of space, found in the same walk
+    log.list("Largest directories", top4log(top.dirs(), mon_pth))
+    log.list("Largest files", top4log(top.files(), mon_pth))
+    log.list("Largest growth in {0} days".format(growth_days),
+             top4log(growers, mon_pth))
+
+    # The parameters of the model, to read the unusual changes
+    msz = best_unit_size(model["min_change"])
+    log.list("Model Values",
+             ["A change is unusual if it's at least {0[sigmas]} standard "
+              "deviations away from the usual growth of its directory (the "
+              "last run weighs {0[alpha]} in it). Until a directory has "
+              "{0[warmup]} runs, any change is unusual.".format(model), "",
+              "Minimum change: {0:6.2f} {1}".format(msz['s'], msz['u'])])
 
     # Show some statistics for the analyzed path
-    mon_pth_sz = best_unit_size(get_size_fast(mon_pth))
+    mon_pth_sz = best_unit_size(mon_pth_bytes)
     log.list("{0} Statistics".format(mon_pth),
-             ["{0:8} directories".format(len(crr_dir)),
+             ["{0:8} directories".format(len(crr_dir) - 1),
               "{0:8.2f} {1}".format(mon_pth_sz['s'], mon_pth_sz['u'])])
     log.time("END TIME")
     notify("Directory Size Monitor", "Finished", "Ok")
@@ -165,5 +264,83 @@ def main(first_exec=False):
         log.send("Changes in size of directories")
         log.write()
 
+
+def main(first_exec=False):
+    """Main section"""
+
+    # The path to monitor changes in directories dir_size. By default, if none
+    # is given, takes the home directory.
+    parser = arguments()
+    args = parser.parse_args()
+    mon_pth = args.path
+    rules = PruneRules(args.exclude, args.max_depth, args.one_file_system)
+    model = dict(alpha=args.alpha, sigmas=args.sigmas, warmup=args.warmup,
+                 min_change=args.min_change)
+
+    if not 0 < args.alpha <= 1:
+        parser.error("--alpha must be between 0 and 1")
+    if args.metrics is not None and not args.daemon:
+        parser.error("--metrics needs --daemon, the metrics are served while "
+                     "it runs. Serve those of the last run with "
+                     "dir_size_metrics.py")
+    if args.daemon:
+        # Walk the path once, and then only the directories changed. Each
+        # report is made from the sizes in memory, without reading the disk
+        from dir_size_watch import SizeWatcher
+        metrics = None
+        if args.metrics is not None:
+            from dir_size_metrics import MetricsServer
+            metrics = MetricsServer(args.metrics,
+                                    max_depth=args.metrics_depth)
+        try:
+            watcher = SizeWatcher(mon_pth, rules, args.top)
+        except OSError as err:
+            if err.errno != errno.ENOSPC:
+                raise
+            watcher = None
+            print("{0}. Walking the whole path for each report".format(err))
+        try:
+            while True:
+                check(mon_pth, watcher.snapshot if watcher else
+                      lambda top: DirSnapshot.from_walk(
+                          mon_pth, top=top, rules=rules),
+                      args.top, first_exec, metrics, model)
+                first_exec = False
+                until = time.time() + args.daemon
+                try:
+                    watcher.run(until) if watcher else None
+                except OSError as err:
+                    # Too many new directories to watch them
+                    if err.errno != errno.ENOSPC:
+                        raise
+                    watcher.close()
+                    watcher = None
+                    print("{0}. Walking the whole path for each report".
+                          format(err))
+                time.sleep(max(0, until - time.time()))
+        finally:
+            watcher.close() if watcher else None
+            metrics.close() if metrics else None
+    elif args.checkpoint:
+        # Stopped by a signal, the progress of the walk is saved too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+        cache = SizeCache(".dir_sizes.db") if args.cache else None
+        checkpoint = ScanCheckpoint(".dir_sizes.ckpt")
+        check(mon_pth, lambda top: DirSnapshot.from_dir_sizes(
+            mon_pth, walk_resumable(mon_pth, checkpoint, cache=cache,
+                                    top_files=top.top_n, rules=rules,
+                                    max_age=args.checkpoint_age * 60 * 60),
+            top),
+              args.top, first_exec, model=model)
+        checkpoint.close()
+        cache.close() if cache else None
+    else:
+        cache = SizeCache(".dir_sizes.db") if args.cache else None
+        check(mon_pth, lambda top: DirSnapshot.from_walk(
+            mon_pth, cache=cache, top=top, rules=rules), args.top, first_exec,
+              model=model)
+        cache.close() if cache else None
+
+
 if __name__ == "__main__":
     main()
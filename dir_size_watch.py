@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+"""
+    dir_size_watch.py: Keep the size of each dir of a tree up to date
+"""
+
+#==============================================================================
+# The size of each directory of a tree kept in memory and updated from the
+# Linux inotify events, instead of walking the whole tree again each time it's
+# needed. The tree is walked once, watching each directory just before it's
+# listed, so no change is lost. Then only the directories with events (an
+# entry created, deleted, moved or written) are listed again, at most once
+# each latency seconds, thus a file written all the time does not make its
+# directory to be listed again for each write. A new subdirectory is walked &
+# watched, and a removed one is forgotten with its whole subtree.
+#
+# If the kernel queue of events overflows, the events lost are unknown. Then
+# all the directories are listed again (only the metadata, the files are not
+# read), because a file grown in place does not change the mtime of its
+# directory, only its own size.
+#
+# inotify is used through ctypes, there is no need of external modules. Each
+# directory needs a watch, the limit per user is in
+# /proc/sys/fs/inotify/max_user_watches (the sysctl
+# fs.inotify.max_user_watches), a tree with more directories raises an OSError
+# ENOSPC that says so
+#
+# Only for Linux & Python 3
+#==============================================================================
+
+#==============================================================================
+#    Copyright 2026 joe di castro <joe@joedicastro.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#==============================================================================
+
+__author__ = "joe di castro <joe@joedicastro.com>"
+__license__ = "GNU General Public License version 3"
+__date__ = "18/10/2026"
+__version__ = "0.1"
+
+try:
+    import sys
+    import os
+    import ctypes
+    import ctypes.util
+    import errno
+    import select
+    import stat
+    import struct
+    import time
+    from dir_snapshot import DirSnapshot
+    from get_size import DirSize, scan_dir
+except ImportError:
+    # Checks the installation of the necessary python modules
+    print((os.linesep * 2).join(["An error found importing one module:",
+          str(sys.exc_info()[1]), "You need to install it", "Stopping..."]))
+    sys.exit(-2)
+
+
+# The inotify flags used (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+
+# The events that change the size of a directory
+WATCH_MASK = (IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW |
+              IN_EXCL_UNLINK)
+
+# The header of each event: wd, mask, cookie & length of the name
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """Create an Inotify object, a minimal wrapper of the inotify syscalls."""
+
+    def __init__(self):
+        """Create the object Inotify itself & its inotify instance."""
+        self.__libc = ctypes.CDLL(ctypes.util.find_library("c"),
+                                  use_errno=True)
+        self.fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            self.__error("inotify_init1")
+
+    def __error(self, call, path=None):
+        """Raise the OSError of the last syscall."""
+        code = ctypes.get_errno()
+        raise OSError(code, "{0}: {1}".format(call, os.strerror(code)), path)
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """Watch a directory, return the watch descriptor."""
+        wd = self.__libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self.__error("inotify_add_watch", path)
+        return wd
+
+    def rm_watch(self, wd):
+        """Stop watching a directory, if it's still watched."""
+        self.__libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout=None):
+        """Get the (wd, mask, name) of the events queued.
+
+        Wait up to timeout seconds (forever if None) for the first one.
+
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as err:
+                if err.errno == errno.EAGAIN:
+                    return events
+                raise
+            start = 0
+            while start < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, start)
+                start += _EVENT.size
+                name = data[start:start + length].rstrip(b"\0")
+                start += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        """Close the inotify instance, all its watches are removed."""
+        os.close(self.fd)
+
+
+class SizeWatcher:
+    """Create a SizeWatcher object that keeps the sizes of a tree up to date.
+
+    The tree is walked when the object is created, the sizes are updated
+    calling update (or run) and got with walk or snapshot.
+
+    """
+
+    def __init__(self, the_path, rules=None, top_files=0, latency=1.0):
+        """Create the object SizeWatcher itself & walk the tree.
+
+        (str) the_path -- The root directory of the tree
+        (PruneRules) rules -- The rules to prune the walk
+        (int) top_files -- The number of the largest files of each directory
+                           to keep
+        (float) latency -- The minimum seconds between two listings of the
+                           same directory
+
+        """
+        self.root = the_path
+        self.top_files = top_files
+        self.latency = latency
+        root_stat = os.stat(the_path)
+        if not stat.S_ISDIR(root_stat.st_mode):
+            raise OSError(errno.ENOTDIR, "Not a directory", the_path)
+        self.rules = rules.for_root(root_stat) if rules else None
+        self.__inotify = Inotify()
+        # For each directory, its DirSize, depth & watch descriptor
+        self.__dirs = {}
+        self.__paths = {}
+        self.__dirty = set()
+        # The last listing of directories (the walk, or a batch of listings
+        # after events): when it started, the seconds it took & the entries
+        # listed
+        self.scan_time, self.scan_duration, self.scan_entries = 0.0, 0.0, 0
+        try:
+            self.__timed(self.__scan, the_path, root_stat, 0)
+        except BaseException:
+            self.close()
+            raise
+
+    def __timed(self, listing, *args):
+        """Do a listing of directories & keep its figures as the last one."""
+        start, self.__listed = time.time(), 0
+        listing(*args)
+        self.scan_time, self.scan_duration, self.scan_entries = (
+            start, time.time() - start, self.__listed)
+
+    def __scan(self, path, dir_stat, depth):
+        """Watch & list a directory, and the subdirectories new for us."""
+        stack = [(path, dir_stat, depth)]
+        while stack:
+            path, dir_stat, depth = stack.pop()
+            try:
+                wd = self.__inotify.add_watch(path)
+            except OSError as err:
+                if err.errno == errno.ENOSPC:
+                    raise OSError(errno.ENOSPC, "Too many directories to "
+                                  "watch, raise the limit of the sysctl "
+                                  "fs.inotify.max_user_watches", path)
+                # Removed, not a directory now or without permission
+                wd = None
+            else:
+                self.__paths[wd] = path
+            leaf = self.rules.leaf(depth) if self.rules else False
+            scan = scan_dir(path, None, self.top_files, self.rules, leaf)
+            self.__listed += 1 + scan.files
+            subdirs = [subdir for subdir, _ in scan.subdirs]
+            before = self.__dirs.get(path)
+            # Hard links are not tracked, unique is the same as bytes
+            dir_bytes = dir_stat.st_size + scan.bytes
+            self.__dirs[path] = (DirSize(path, dir_bytes,
+                                         dir_stat.st_blocks * 512 +
+                                         scan.allocated, dir_bytes,
+                                         scan.files, subdirs, scan.largest),
+                                 depth, wd)
+            if before:
+                for subdir in set(before[0].subdirs).difference(subdirs):
+                    self.__forget(subdir)
+            stack.extend((subdir, subdir_stat, depth + 1)
+                         for subdir, subdir_stat in scan.subdirs
+                         if subdir not in self.__dirs)
+
+    def __forget(self, path):
+        """Forget a directory & its whole subtree, and stop watching them."""
+        stack = [path]
+        while stack:
+            entry = self.__dirs.pop(stack.pop(), None)
+            if entry is None:
+                continue
+            dir_size, _, wd = entry
+            # A directory moved inside the tree keeps its watch, that could
+            # be already of its new path
+            if wd is not None and self.__paths.get(wd) == dir_size.path:
+                del self.__paths[wd]
+                self.__inotify.rm_watch(wd)
+            stack.extend(dir_size.subdirs)
+
+    def __rescan(self, paths):
+        """List again the directories with events still in the tree."""
+        # The parents before their subdirectories, thus a subdirectory
+        # already forgotten is not listed
+        for path in sorted(paths, key=len):
+            entry = self.__dirs.get(path)
+            if entry is None:
+                continue
+            try:
+                dir_stat = os.lstat(path)
+            except OSError:
+                dir_stat = None
+            if dir_stat is None or not stat.S_ISDIR(dir_stat.st_mode):
+                # Its parent has events too, and will forget it
+                continue
+            self.__scan(path, dir_stat, entry[1])
+
+    def __overflow(self):
+        """List again all the directories, the events lost are unknown."""
+        self.__dirty.update(self.__dirs)
+
+    def update(self, timeout=None):
+        """Wait for events & update the sizes of the directories changed.
+
+        Wait up to timeout seconds (forever if None) for the first event, and
+        then latency seconds more for the rest. Return the number of events.
+
+        """
+        events = self.__inotify.read(timeout)
+        if events and self.latency:
+            time.sleep(self.latency)
+            events.extend(self.__inotify.read(0))
+        for wd, mask, _ in events:
+            if mask & IN_Q_OVERFLOW:
+                self.__overflow()
+            elif mask & IN_IGNORED:
+                # The directory has been removed, its wd could be reused
+                self.__paths.pop(wd, None)
+            elif wd in self.__paths:
+                self.__dirty.add(self.__paths[wd])
+        if self.__dirty:
+            self.__timed(self.__rescan, self.__dirty)
+        self.__dirty.clear()
+        return len(events)
+
+    def run(self, until):
+        """Update the sizes until a time (as from time.time())."""
+        while True:
+            timeout = until - time.time()
+            if timeout <= 0:
+                return
+            self.update(timeout)
+
+    def walk(self):
+        """Make a generator of the DirSize of each directory, from memory.
+
+        Each directory is yielded before its subdirectories, like walk_sizes.
+
+        """
+        stack = [self.root]
+        while stack:
+            entry = self.__dirs.get(stack.pop())
+            if entry:
+                yield entry[0]
+                stack.extend(entry[0].subdirs)
+
+    def snapshot(self, top=None):
+        """Make a DirSnapshot of the sizes now, without reading the disk.
+
+        (TopSizes) top -- Keep here the largest files & directories (but the
+                          root itself) of the tree
+
+        The figures of the scan of the snapshot are those of the last
+        listing of directories.
+
+        """
+        snap = DirSnapshot.from_dir_sizes(self.root, self.walk(), top)
+        snap.when, snap.duration, snap.entries = (
+            self.scan_time, self.scan_duration, self.scan_entries)
+        return snap
+
+    def close(self):
+        """Stop watching the tree."""
+        self.__inotify.close()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+"""
+    dir_snapshot.py: A compact snapshot of the size of each dir of a tree
+"""
+
+#==============================================================================
+# A read-only mapping of the path of each directory of a tree to the size of
+# its whole subtree, like the dictionary of get_size.get_dir_sizes, but much
+# smaller for huge trees (millions of directories). The paths are not stored,
+# only the name of each directory (once in a shared table for all the
+# directories with the same name) and the index of its parent. The sizes and
+# the indexes are kept in arrays of machine integers instead of python objects,
+# 24 bytes for each directory plus its name (if it's a new one), up to 2^31
+# directories.
+#
+# The subdirectories of a directory are stored together and sorted by name,
+# thus a path is found by a binary search of each one of its components, and
+# the paths are iterated sorted by their components (each directory just
+# before its subdirectories) without sorting them.
+#
+# A snapshot is saved in a binary file with a versioned header and the arrays
+# one after another, as they are in memory. The file is written aside and then
+# renamed over the old one, thus a crash never leaves a half written snapshot.
+# It's loaded with mmap, without reading it, only the pages of the directories
+# looked up are read from disk. Two snapshots are compared merging the sorted
+# subdirectories of each directory in both, one directory at a time. Only for
+# Python 3.3+ (memoryview.cast and os.replace).
+#
+# A snapshot can keep too a model of the growth of each directory by run, an
+# exponentially weighted mean and variance (10 bytes for each directory). Each
+# run updates the model of the last snapshot with the growth since it, in the
+# same merge, and the growths far from the mean of their model (in standard
+# deviations) are the unusual ones. Thus a directory that grows a lot every
+# day is not reported each day, but a quiet one that starts to grow is.
+#==============================================================================
+
+#==============================================================================
+#    Copyright 2026 joe di castro <joe@joedicastro.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#==============================================================================
+
+__author__ = "joe di castro <joe@joedicastro.com>"
+__license__ = "GNU General Public License version 3"
+__date__ = "18/10/2026"
+__version__ = "0.1"
+
+try:
+    import sys
+    import os
+    import heapq
+    import mmap
+    import struct
+    import tempfile
+    import time
+    from array import array
+    from collections.abc import Mapping
+    from os import fsencode, fsdecode
+    from get_size import walk_sizes
+except ImportError:
+    # Checks the installation of the necessary python modules
+    print((os.linesep * 2).join(["An error found importing one module:",
+          str(sys.exc_info()[1]), "You need to install it", "Stopping..."]))
+    sys.exit(-2)
+
+
+# The header of a snapshot file: magic, version, a number to check the byte
+# order, number of directories, number of names, bytes of the table of names
+# and bytes of the root path. The header and each array start at a multiple of
+# 8 bytes. Since the version 3 it's followed by the figures of the scan that
+# made the snapshot: files, entries, duration & time. The version 1 has not
+# the model of the growth
+_MAGIC, _VERSION, _BYTE_ORDER = b"DIRSNAP\n", 3, 0x01020304
+_HEADER = struct.Struct("=8sIIQQQQ")
+_SCAN = struct.Struct("=QQdd")
+
+
+def _padding(length):
+    """Get the bytes needed after a section to align the next one to 8."""
+    return -length % 8
+
+
+class DirSnapshot(Mapping):
+    """Create a DirSnapshot object with the size of each dir of a tree.
+
+    Works as a read-only dictionary with the path of each directory
+    (including the root) as key and the size in bytes of its whole subtree as
+    value. The paths are iterated sorted by their components.
+
+    For each directory, by its index (the root is 0), are stored:
+
+    parents = The index of its parent directory (-1 for the root)
+    names = The index of its name in the table of names
+    first = The index of its first subdirectory
+    count = The number of its subdirectories
+    sizes = The size in bytes of its subtree
+
+    And, once learn has been called, the model of its growth by run:
+
+    mean = The weighted mean of the growth in bytes
+    var = The weighted variance of the growth
+    runs = The number of runs in the model (up to 65535)
+
+    """
+
+    def __init__(self, root):
+        """Create the object DirSnapshot itself, with only the root.
+
+        (str) root -- The path of the root directory, as was walked
+
+        """
+        self.root = root
+        # The scan that made it: the entries that are not directories, the
+        # entries listed (all of them for a walk), the seconds it took and
+        # when it started (as from time.time())
+        self.files = 0
+        self.entries = 0
+        self.duration = 0.0
+        self.when = 0.0
+        self.parents = array("i", [-1])
+        self.names = array("I", [0])
+        self.first = array("I", [1])
+        self.count = array("I", [0])
+        self.sizes = array("Q", [0])
+        # The names encoded, one after another, and where each one starts.
+        # The name 0 is the empty name of the root
+        self.table = bytearray()
+        self.offsets = array("Q", [0, 0])
+        # The model of the growth of each directory, empty until learn
+        self.mean = array("f")
+        self.var = array("f")
+        self.runs = array("H")
+
+    @classmethod
+    def from_walk(cls, the_path, workers=8, cache=None, top=None, rules=None):
+        """Make the snapshot of a tree, walking it with get_size.walk_sizes.
+
+        The same arguments and sizes as get_size.get_dir_sizes, but the paths
+        of the directories are never kept all at once, only those of the
+        directories pending to list.
+
+        """
+        return cls.from_dir_sizes(the_path, walk_sizes(
+            the_path, workers, cache, top.top_n if top else 0, rules), top)
+
+    @classmethod
+    def from_dir_sizes(cls, the_path, dir_sizes, top=None):
+        """Make the snapshot of a tree from the DirSize of each directory.
+
+        (str) the_path -- The root of the tree
+        (iterable) dir_sizes -- The DirSize of each directory, each one after
+                                its parent, like those of walk_sizes
+        (TopSizes) top -- Keep here the largest files & directories (but
+                          the_path itself) of the tree
+
+        The figures of the scan are those of getting dir_sizes, that is the
+        walk if it's a generator like walk_sizes.
+
+        """
+        snap = cls(the_path)
+        snap.when = time.time()
+        parents, names, first = snap.parents, snap.names, snap.first
+        count, sizes = snap.count, snap.sizes
+        name_ids, pending = {}, {the_path: 0}
+        for dir_size in dir_sizes:
+            index = pending.pop(dir_size.path)
+            sizes[index] = dir_size.bytes
+            snap.files += dir_size.files
+            for file_size, file_path in dir_size.largest if top else ():
+                top.add_file(file_size, file_path)
+            # The subdirectories of a directory are numbered together, thus
+            # a directory has always a lower index than its subdirectories
+            subdirs = sorted((fsencode(os.path.basename(subdir)), subdir)
+                             for subdir in dir_size.subdirs)
+            first[index], count[index] = len(sizes), len(subdirs)
+            for name, subdir in subdirs:
+                if name not in name_ids:
+                    name_ids[name] = len(snap.offsets) - 1
+                    snap.table.extend(name)
+                    snap.offsets.append(len(snap.table))
+                pending[subdir] = len(sizes)
+                parents.append(index)
+                names.append(name_ids[name])
+                first.append(0)
+                count.append(0)
+                sizes.append(0)
+
+        snap.duration = time.time() - snap.when
+        snap.entries = len(sizes) + snap.files
+
+        # Roll up the sizes from the leaves to the root
+        for index in range(len(sizes) - 1, 0, -1):
+            sizes[parents[index]] += sizes[index]
+        if top:
+            for index in heapq.nlargest(top.top_n, range(1, len(sizes)),
+                                        key=sizes.__getitem__):
+                top.add_dir(sizes[index], snap.path(index))
+        return snap
+
+    def __name(self, index):
+        """Get the name of a directory, encoded."""
+        name = self.names[index]
+        return bytes(self.table[self.offsets[name]:self.offsets[name + 1]])
+
+    def find(self, path):
+        """Get the index of a directory by its path, None if it's not here."""
+        if path == self.root:
+            return 0
+        prefix = self.root if self.root.endswith(os.sep) else \
+            self.root + os.sep
+        if not path.startswith(prefix):
+            return None
+        index = 0
+        for name in path[len(prefix):].split(os.sep):
+            name = fsencode(name)
+            low = self.first[index]
+            high = end = low + self.count[index]
+            while low < high:
+                middle = (low + high) // 2
+                if self.__name(middle) < name:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low == end or self.__name(low) != name:
+                return None
+            index = low
+        return index
+
+    def path(self, index):
+        """Get the path of a directory by its index."""
+        names = []
+        while index:
+            names.append(fsdecode(self.__name(index)))
+            index = self.parents[index]
+        return os.path.join(self.root, *reversed(names))
+
+    def walk(self, max_depth=None):
+        """Make a generator of the (path, size) of each directory, sorted.
+
+        (int) max_depth -- Only the directories up to this depth (the root is
+                           0), all of them if None
+
+        """
+        stack = [(0, self.root, 0)]
+        while stack:
+            index, path, depth = stack.pop()
+            yield path, self.sizes[index]
+            if max_depth is not None and depth >= max_depth:
+                continue
+            first = self.first[index]
+            stack.extend((subdir, os.path.join(path,
+                                               fsdecode(self.__name(subdir))),
+                          depth + 1)
+                         for subdir in range(first + self.count[index] - 1,
+                                             first - 1, -1))
+
+    def __merge(self, before):
+        """Make a generator of the directories of this & other snapshot.
+
+        Yield a (index before, index now, path) for each directory in any of
+        both, sorted like walk. The index is None where it's not.
+
+        """
+        stack = [(0, 0, self.root)]
+        while stack:
+            bfr_index, index, path = stack.pop()
+            yield bfr_index, index, path
+            # Merge the subdirectories of both, sorted by name
+            bfr_subdirs = before.__subdirs(bfr_index)
+            subdirs = self.__subdirs(index)
+            merged = []
+            while bfr_subdirs or subdirs:
+                if not subdirs or (bfr_subdirs and
+                                   bfr_subdirs[-1][0] > subdirs[-1][0]):
+                    name, bfr_subdir = bfr_subdirs.pop()
+                    merged.append((bfr_subdir, None, name))
+                elif not bfr_subdirs or bfr_subdirs[-1][0] < subdirs[-1][0]:
+                    name, subdir = subdirs.pop()
+                    merged.append((None, subdir, name))
+                else:
+                    (name, bfr_subdir), (_, subdir) = (bfr_subdirs.pop(),
+                                                       subdirs.pop())
+                    merged.append((bfr_subdir, subdir, name))
+            # The last names are popped first, and the first ones are pushed
+            # last to be walked first
+            stack.extend((bfr_subdir, subdir,
+                          os.path.join(path, fsdecode(name)))
+                         for bfr_subdir, subdir, name in merged)
+
+    def diff(self, before):
+        """Make a generator of the directories changed since other snapshot.
+
+        (DirSnapshot) before -- The previous snapshot of the same tree
+
+        Yield a (path, size before, size now) for each directory whose size
+        has changed, sorted like walk. The size before is None for the new
+        directories and the size now is None for the deleted ones.
+
+        """
+        for bfr_index, index, path in self.__merge(before):
+            bfr_size = None if bfr_index is None else before.sizes[bfr_index]
+            size = None if index is None else self.sizes[index]
+            if bfr_size != size:
+                yield path, bfr_size, size
+
+    def learn(self, before, alpha=0.1, sigmas=4.0, warmup=5,
+              min_change=10 * 2 ** 20):
+        """Update the model of the growth of each dir & find the unusual ones.
+
+        The growth of each directory since other snapshot is compared with
+        its model there, and the model is updated with it here. The new
+        directories start a model from scratch.
+
+        (DirSnapshot) before -- The previous snapshot of the same tree
+        (float) alpha -- The weight of the last growth in the model, from 0
+                         to 1. The higher, the sooner the older runs are
+                         forgotten
+        (float) sigmas -- A growth is unusual if it's this many standard
+                          deviations away from the mean of the model
+        (int) warmup -- The runs a model needs to be trusted. Until then, any
+                        growth of at least min_change is unusual
+        (int) min_change -- The bytes of the smallest growth (or shrink)
+                            that could be unusual
+
+        Return a list of (path, size before, size now, deviations) of the
+        unusual directories, sorted like walk. The deviations are None for
+        the models still warming up, and inf for those that never changed.
+
+        """
+        dirs = len(self.sizes)
+        mean, var = array("f", [0.0]) * dirs, array("f", [0.0]) * dirs
+        runs = array("H", [0]) * dirs
+        trained = len(before.runs) > 0
+        unusual = []
+        for bfr_index, index, path in self.__merge(before):
+            if index is None or bfr_index is None:
+                continue
+            growth = float(self.sizes[index]) - before.sizes[bfr_index]
+            if trained:
+                bfr_mean, bfr_var, bfr_runs = (before.mean[bfr_index],
+                                               before.var[bfr_index],
+                                               before.runs[bfr_index])
+            else:
+                bfr_mean, bfr_var, bfr_runs = 0.0, 0.0, 0
+            deviation = growth - bfr_mean
+            if deviation and abs(deviation) >= min_change:
+                if bfr_runs < warmup:
+                    unusual.append((path, before.sizes[bfr_index],
+                                    self.sizes[index], None))
+                elif deviation * deviation > sigmas * sigmas * bfr_var:
+                    unusual.append((path, before.sizes[bfr_index],
+                                    self.sizes[index],
+                                    deviation / bfr_var ** 0.5 if bfr_var
+                                    else float("inf")))
+            # The exponentially weighted mean & variance, updated in place
+            increment = alpha * deviation
+            mean[index] = bfr_mean + increment
+            var[index] = (1 - alpha) * (bfr_var + deviation * increment)
+            runs[index] = min(bfr_runs + 1, 0xFFFF)
+        self.mean, self.var, self.runs = mean, var, runs
+        return unusual
+
+    def __subdirs(self, index):
+        """Get the (name, index) of the subdirectories of a directory."""
+        if index is None:
+            return []
+        first = self.first[index]
+        return [(self.__name(subdir), subdir)
+                for subdir in range(first, first + self.count[index])]
+
+    def save(self, filename):
+        """Save the snapshot in a file, replacing it at once.
+
+        The snapshot is written in a temporary file of the same directory,
+        that is renamed to filename when it's complete and in disk.
+
+        """
+        root = fsencode(self.root)
+        if len(self.runs):
+            model = [self.mean, self.var, self.runs]
+        else:
+            dirs = len(self.sizes)
+            model = [array("f", [0.0]) * dirs, array("f", [0.0]) * dirs,
+                     array("H", [0]) * dirs]
+        sections = [self.parents, self.names, self.first, self.count,
+                    self.sizes, self.offsets, self.table] + model
+        path = os.path.dirname(os.path.abspath(filename))
+        handle, temp_name = tempfile.mkstemp(prefix=".snapshot", dir=path)
+        try:
+            with os.fdopen(handle, "wb") as snap_file:
+                snap_file.write(_HEADER.pack(_MAGIC, _VERSION, _BYTE_ORDER,
+                                             len(self.sizes),
+                                             len(self.offsets) - 1,
+                                             len(self.table), len(root)))
+                snap_file.write(_SCAN.pack(self.files, self.entries,
+                                           self.duration, self.when))
+                for section in [root] + sections:
+                    section = memoryview(section).cast("B")
+                    snap_file.write(section)
+                    snap_file.write(b"\0" * _padding(len(section)))
+                snap_file.flush()
+                os.fsync(snap_file.fileno())
+            os.replace(temp_name, filename)
+        except BaseException:
+            os.remove(temp_name)
+            raise
+
+    @classmethod
+    def load(cls, filename):
+        """Load a snapshot saved in a file, reading it only when needed.
+
+        The arrays of the snapshot are views of the file mapped in memory.
+        Raise ValueError if the file is not a snapshot of this version (or
+        a previous one, without the scan or the model).
+
+        """
+        with open(filename, "rb") as snap_file:
+            try:
+                data = mmap.mmap(snap_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError("Empty snapshot file: {0}".format(filename))
+        if len(data) < _HEADER.size:
+            raise ValueError("Not a snapshot file: {0}".format(filename))
+        magic, version, byte_order, dirs, names, table, root = \
+            _HEADER.unpack_from(data)
+        if (magic, byte_order) != (_MAGIC, _BYTE_ORDER) or \
+                not 1 <= version <= _VERSION:
+            raise ValueError("Not a snapshot file of version {0}: {1}".
+                             format(_VERSION, filename))
+        view, start = memoryview(data), _HEADER.size
+        scan = (0, 0, 0.0, 0.0)
+        if version > 2:
+            if len(data) < start + _SCAN.size:
+                raise ValueError("Truncated snapshot file: {0}".
+                                 format(filename))
+            scan = _SCAN.unpack_from(data, start)
+            start += _SCAN.size
+
+        def section(typecode, length):
+            """Get a view of the next section of the file."""
+            nbytes = length * struct.calcsize(typecode)
+            if start + nbytes > len(view):
+                raise ValueError("Truncated snapshot file: {0}".
+                                 format(filename))
+            part = view[start:start + nbytes].cast(typecode)
+            return part, start + nbytes + _padding(nbytes)
+
+        root, start = section("B", root)
+        snap = cls(fsdecode(root.tobytes()))
+        snap.files, snap.entries, snap.duration, snap.when = scan
+        snap.parents, start = section("i", dirs)
+        snap.names, start = section("I", dirs)
+        snap.first, start = section("I", dirs)
+        snap.count, start = section("I", dirs)
+        snap.sizes, start = section("Q", dirs)
+        snap.offsets, start = section("Q", names + 1)
+        snap.table, start = section("B", table)
+        if version > 1:
+            snap.mean, start = section("f", dirs)
+            snap.var, start = section("f", dirs)
+            snap.runs, start = section("H", dirs)
+        return snap
+
+    def __getitem__(self, path):
+        index = self.find(path)
+        if index is None:
+            raise KeyError(path)
+        return self.sizes[index]
+
+    def __contains__(self, path):
+        return self.find(path) is not None
+
+    def __iter__(self):
+        for path, _ in self.walk():
+            yield path
+
+    def __len__(self):
+        return len(self.sizes)
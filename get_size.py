@@ -49,13 +49,35 @@
 __author__ = "joe di castro <joe@joedicastro.com>"
 __license__ = "GNU General Public License version 3"
 __date__ = "30/12/2010"
-__version__ = "0.1"
+__version__ = "0.2"
 
 try:
     import sys
     import os
+    import fnmatch
+    import heapq
+    import random
+    import re
+    import sqlite3
+    import stat
     import time
-    from subprocess import Popen, PIPE
+    from collections import namedtuple
+    # Python 2 needs the backport of concurrent.futures (pip install futures)
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from multiprocessing import cpu_count
+    try:
+        from os import scandir, fsencode, fsdecode
+        from queue import Queue
+    except ImportError:
+        # Python 2 needs the backport of os.scandir (pip install scandir)
+        from scandir import scandir
+        from Queue import Queue
+        fsencode = fsdecode = str
+    try:
+        # Optional, only to convert arrays of sizes in best_unit_sizes
+        import numpy
+    except ImportError:
+        numpy = None
 except ImportError:
     # Checks the installation of the necessary python modules
     print((os.linesep * 2).join(["An error found importing one module:",
@@ -77,43 +99,1088 @@ def get_dir_size(the_path):
 
 
 # My Version, accurate. Same results as *NIX command "du -bs". Take in
-# consideration symbolic links and don't follow them. Works with single files
-def get_size(the_path):
+# consideration symbolic links and don't follow them. Works with single files.
+# Now relies on the scandir engine (see get_size_parallel below), walking the
+# tree in this thread unless more workers are asked for. The threads only pay
+# off when each listing waits for the storage (NFS, a cold cache...), in a
+# local disk with the cache warm the serial walk is faster
+def get_size(the_path, cache=None, rules=None, workers=1):
     """Get size of a directory tree or a file in bytes."""
-    path_size = 0
-    for path, directories, files in os.walk(the_path):
-        for filename in files:
-            path_size += os.lstat(os.path.join(path, filename)).st_size
-        for directory in directories:
-            path_size += os.lstat(os.path.join(path, directory)).st_size
-    path_size += os.path.getsize(the_path)
-    return path_size
+    return get_size_parallel(the_path, workers, cache, rules)
 
 
 # less pythonic, but faster and still accurate. Take in consideration the
-# symbolic links and don't follow them
+# symbolic links and don't follow them. No recursion, the directories pending
+# to list are kept in a stack and the sizes summed in a local variable, thus
+# there is no limit for the depth of the tree and the cost of each entry is
+# the same at any level of the tree
 def get_size_fast(the_path):
     """Get size of a directory tree or a file in bytes."""
+    path_stat = os.lstat(the_path)
+    path_size = path_stat.st_size
+    stack = [the_path] if stat.S_ISDIR(path_stat.st_mode) else []
+    while stack:
+        try:
+            entries = scandir(stack.pop())
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                entry_stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            path_size += entry_stat.st_size
+            if stat.S_ISDIR(entry_stat.st_mode):
+                stack.append(entry.path)
+    return path_size
+
+
+# Not accurate at all, an estimation of the size of enormous trees in a small
+# fraction of the time. The top of the tree (the first exact_dirs directories,
+# breadth first) is walked, and below it random paths are walked down to a
+# leaf (Knuth's estimator): a directory of the frontier of the walked top is
+# chosen at random and then, at each level, one of the subdirectories. The size
+# found is multiplied by the number of directories it was chosen from. In the
+# directories with a lot of files only a sample of them are stat'ed, their mean
+# stands for the rest. The mean of all the paths is the estimation of the part
+# not walked and their variance gives a hint of its error. The type of the
+# entries comes from the directory listing, without stat calls. Beware, it's
+# not a confidence interval. In unbalanced trees most of the bytes are in a few
+# paths seldom walked, the variance of the paths is underestimated and the
+# error is often larger (in real trees, "b" +/- 2 sd missed the real size in
+# a third or even a half of the seeds)
+def get_size_estimate(the_path, probes=200, exact_dirs=256, files_sample=256,
+                      sigmas=2.0, seed=None):
+    """Estimate the size of a directory tree and convert it to the best unit.
+
+    Return a dictionary like best_unit_size plus these keys/values:
+
+    "e" -- (float) The spread of the estimation in bytes, sigmas times its
+           standard deviation as measured from the random paths. Only a hint
+           of the precision, the real size is often out of "b" +/- "e"
+    "n" -- (int) The number of random paths walked
 
-    def get_sizes(the_path):
-        """Make a generator of individual file & directory sizes."""
-        if not os.path.islink(the_path):
-            if os.path.isdir(the_path):
-                for file_or_dir in os.listdir(the_path):
-                    path = os.path.join(the_path, file_or_dir)
-                    if os.path.isfile(path):
-                        yield os.lstat(path).st_size
+    (int) probes -- The number of random paths to walk
+    (int) exact_dirs -- The number of directories to walk at the top of tree
+    (int) files_sample -- The maximum number of files to stat in a directory
+    (float) sigmas -- The standard deviations of the spread
+    (int) seed -- The seed of the random choices, for repeatable results
+
+    """
+    if sigmas < 0:
+        raise ValueError("The sigmas of the spread can't be negative: "
+                         "{0}".format(sigmas))
+    rnd = random.Random(seed)
+    listings = {}
+
+    def listing(path):
+        """Get the bytes of a directory and its files, & its subdirectories.
+
+        Return a tuple with the bytes, the variance of the bytes due to the
+        sample of files and the list of the subdirectories. Each directory is
+        listed only once, even if it's in several paths.
+
+        """
+        if path not in listings:
+            subdirs, files, sizes = [], [], []
+            try:
+                for entry in scandir(path):
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
                     else:
-                        for size in get_sizes(path):
-                            yield size
-            yield os.lstat(the_path).st_size
+                        files.append(entry)
+            except OSError:
+                pass
+            for entry in rnd.sample(files, min(files_sample, len(files))):
+                try:
+                    sizes.append(entry.stat(follow_symlinks=False).st_size)
+                except OSError:
+                    continue
+            files_bytes = files_var = 0.0
+            if sizes:
+                mean = float(sum(sizes)) / len(sizes)
+                files_bytes = mean * len(files)
+                if 1 < len(sizes) < len(files):
+                    # The variance of the total of a sample without
+                    # replacement, with the finite population correction
+                    files_var = (len(files) ** 2 * (1 - float(len(sizes)) /
+                                                    len(files)) *
+                                 sum((size - mean) ** 2 for size in sizes) /
+                                 (len(sizes) - 1) / len(sizes))
+            try:
+                dir_bytes = os.stat(path).st_size
+            except OSError:
+                # Removed while estimating, like a directory not listed
+                dir_bytes = 0
+            listings[path] = (dir_bytes + files_bytes, files_var, subdirs)
+        return listings[path]
+
+    if not os.path.isdir(the_path):
+        result = best_unit_size(os.path.getsize(the_path))
+        result.update({"e": 0.0, "n": 0})
+        return result
+
+    # The top of the tree, breadth first
+    top_bytes, top_var, frontier, walked = 0.0, 0.0, [the_path], 0
+    while frontier and walked < exact_dirs:
+        level, frontier = frontier, []
+        for num, path in enumerate(level):
+            if walked >= exact_dirs:
+                frontier.extend(level[num:])
+                break
+            dir_bytes, dir_var, subdirs = listing(path)
+            top_bytes += dir_bytes
+            top_var += dir_var
+            frontier.extend(subdirs)
+            walked += 1
+
+    # The random paths below the frontier
+    estimates = []
+    for probe in range(max(2, probes) if frontier else 0):
+        path, weight, estimate = rnd.choice(frontier), len(frontier), 0.0
+        while path:
+            dir_bytes, _, subdirs = listing(path)
+            estimate += weight * dir_bytes
+            weight *= len(subdirs)
+            path = rnd.choice(subdirs) if subdirs else None
+        estimates.append(estimate)
+
+    mean = variance = 0.0
+    if estimates:
+        mean = sum(estimates) / len(estimates)
+        variance = (sum((est - mean) ** 2 for est in estimates) /
+                    (len(estimates) - 1))
+    result = best_unit_size(int(round(top_bytes + mean)))
+    variance = top_var + variance / max(1, len(estimates))
+    result.update({"e": sigmas * variance ** 0.5, "n": len(estimates)})
+    return result
+
+
+# The scandir engine. Only one lstat per entry, the type of the entry is taken
+# from that same lstat, so there is no need of isdir/isfile/islink calls. The
+# subdirectories are listed by a bounded pool of threads, the GIL is released
+# while the kernel lists or stats, thus several directories are read at once.
+# Same results as get_size and "du -bs". From that same lstat are taken the
+# apparent size (st_size), the allocated size (st_blocks) and the inode of the
+# files with several hard links (only of them), to count them only once
+class DirSize(namedtuple("DirSize",
+                         "path bytes allocated unique files subdirs largest")):
+    """The sizes of a directory walked by walk_sizes.
+
+    path -- (str) The path of the directory
+    bytes -- (int) The size of the directory itself plus all its entries that
+             are not directories (the apparent size, like "du -bs -l")
+    allocated -- (int) The same, but the size allocated in disk (st_blocks
+                 * 512), like "du -B1 -s -l"
+    unique -- (int) The same as bytes, but the files with several hard links
+              are counted only the first time (like "du -bs")
+    files -- (int) The number of the entries that are not directories
+    subdirs -- (list) The paths of its subdirectories
+    largest -- (list) The (bytes, path) of its largest files, largest first
+
+    """
+
+    __slots__ = ()
+
+
+class DirScan(namedtuple("DirScan",
+                         "bytes allocated files largest links subdirs names")):
+    """The entries of a directory listed by scan_dir.
+
+    bytes -- (int) The bytes of all the entries that are not directories
+    allocated -- (int) The bytes allocated in disk of these entries
+    files -- (int) The number of these entries
+    largest -- (list) The (bytes, path) of the largest of them, largest first
+    links -- (list) The (inode, bytes) of those that have several hard links,
+             the inode is the (st_dev, st_ino) packed in a single int
+    subdirs -- (list) The (path, stat) of each subdirectory
+    names -- (list) The names of the subdirectories if the directory has been
+             listed, None if it can't be listed or comes from the cache
+
+    """
+
+    __slots__ = ()
+
+
+# The rules to prune a walk of the scandir engine. Are applied while a
+# directory is listed, thus an excluded entry is never stat'ed and an excluded
+# directory is never listed. The excluded entries are not counted at all, like
+# the directories in other filesystems (as "du -x" does). The directories below
+# max_depth are counted as entries of their parent, but are not listed
+class PruneRules:
+    """Create a PruneRules object with the rules to prune a walk.
+
+    The rules are:
+
+    excludes = The glob patterns of the entries to exclude. A pattern with a
+               path separator is matched against the whole path of the entry
+               (e.g. "/proc", "*/.git/objects"), the rest against its name
+               (e.g. ".git", "*.iso")
+    max_depth = The maximum depth of the directories to list (the walked path
+                is 0), None for no limit
+    one_fs = If True, do not walk the directories in other filesystems
+
+    """
+
+    def __init__(self, excludes=(), max_depth=None, one_fs=False):
+        """Create the object PruneRules itself & compile the patterns."""
+        self.excludes = sorted(excludes)
+        self.max_depth = max_depth
+        self.one_fs = one_fs
+        self.dev = None
+        names = [fnmatch.translate(pat) for pat in excludes
+                 if os.sep not in pat]
+        paths = [fnmatch.translate(pat) for pat in excludes if os.sep in pat]
+        self.__names = re.compile("|".join(names)).match if names else None
+        self.__paths = re.compile("|".join(paths)).match if paths else None
+
+    def __repr__(self):
+        """Only the rules that change the entries listed of a directory.
+
+        The max_depth is not here, the directories listed at the maximum
+        depth are never cached.
+
+        """
+        return "PruneRules({0!r}, one_fs={1!r})".format(self.excludes,
+                                                       self.one_fs)
+
+    def for_root(self, root_stat):
+        """Get a copy of the rules for a walk from a root path."""
+        rules = PruneRules(self.excludes, self.max_depth, self.one_fs)
+        rules.dev = root_stat.st_dev if self.one_fs else None
+        return rules
+
+    def excluded(self, name, path):
+        """Check if an entry is excluded by its name or path."""
+        return bool((self.__names and self.__names(name)) or
+                    (self.__paths and self.__paths(path)))
+
+    def leaf(self, depth):
+        """Check if the directories at this depth must not be listed."""
+        return self.max_depth is not None and depth >= self.max_depth
+
+
+# The entries listed between two calls to the stop function of scan_dir, thus
+# the listing of a directory with millions of entries can be stopped at once
+STOP_ENTRIES = 1024
+
+
+def scan_dir(the_path, cached=None, top_files=0, rules=None, leaf=False,
+             stop=None):
+    """List a directory & get the size of its entries.
+
+    (str) the_path -- The directory to list
+    (DirScan) cached -- An unchanged directory from a SizeCache, only its
+                        subdirectories are stat'ed
+    (int) top_files -- The number of the largest files to keep
+    (PruneRules) rules -- The rules to exclude entries (from for_root)
+    (bool) leaf -- The subdirectories are counted as entries & not returned
+    (function) stop -- Called each STOP_ENTRIES entries, the listing is
+                       stopped if it returns True
+
+    Return a DirScan. If the listing has been stopped, it has only the
+    entries listed until then, and names is None (it's never cached).
+
+    """
+    dev = rules.dev if rules else None
+    if cached:
+        subdirs = []
+        largest = [(size, os.path.join(the_path, name))
+                   for size, name in cached.largest[:top_files]]
+        for name in cached.names:
+            path = os.path.join(the_path, name)
+            try:
+                subdir_stat = os.lstat(path)
+            except OSError:
+                continue
+            if not stat.S_ISDIR(subdir_stat.st_mode):
+                continue
+            if dev is None or subdir_stat.st_dev == dev:
+                subdirs.append((path, subdir_stat))
+        return cached._replace(largest=largest, subdirs=subdirs, names=None)
+
+    files_bytes, files_blocks, files = 0, 0, 0
+    largest, links, subdirs, names = [], [], [], []
+    try:
+        entries = scandir(the_path)
+    except OSError:
+        # Like os.walk, ignore the directories that can't be listed
+        return DirScan(0, 0, 0, largest, links, subdirs, None)
+    for number, entry in enumerate(entries):
+        if stop and not number % STOP_ENTRIES and stop():
+            names = None
+            break
+        if rules and rules.excluded(entry.name, entry.path):
+            continue
+        try:
+            entry_stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            # The entry has been removed while the directory was listed
+            continue
+        if stat.S_ISDIR(entry_stat.st_mode):
+            if dev is not None and entry_stat.st_dev != dev:
+                continue
+            if leaf:
+                files_bytes += entry_stat.st_size
+                files_blocks += _blocks(entry_stat)
+                continue
+            subdirs.append((entry.path, entry_stat))
+            names.append(entry.name)
+        else:
+            files_bytes += entry_stat.st_size
+            files_blocks += _blocks(entry_stat)
+            files += 1
+            if entry_stat.st_nlink > 1:
+                links.append(((entry_stat.st_dev << 64) | entry_stat.st_ino,
+                              entry_stat.st_size))
+            # A min-heap, never longer than top_files
+            if len(largest) < top_files:
+                heapq.heappush(largest, (entry_stat.st_size, entry.path))
+            elif top_files and entry_stat.st_size > largest[0][0]:
+                heapq.heapreplace(largest, (entry_stat.st_size, entry.path))
+    largest.sort(reverse=True)
+    return DirScan(files_bytes, files_blocks * 512, files, largest, links,
+                   subdirs, names)
+
+
+def _blocks(a_stat):
+    """Get the blocks of 512 bytes allocated, 0 where st_blocks is missing."""
+    return getattr(a_stat, "st_blocks", 0)
+
+
+def _dir_size(path, dir_stat, scan, seen, cache=None, rules=None,
+              leaf=False):
+    """Make the DirSize of a directory from its DirScan.
+
+    (set) seen -- The inodes with several hard links already counted in the
+                  walk, the new ones are added
+
+    The directory is stored in the cache (if any) when has been listed, but
+    not if it's a leaf of the walk.
+
+    """
+    if cache and scan.names is not None and not leaf:
+        cache.put(path, dir_stat, scan, rules)
+    dir_bytes = dir_stat.st_size + scan.bytes
+    unique = dir_bytes
+    for inode, size in scan.links:
+        if inode in seen:
+            unique -= size
+        else:
+            seen.add(inode)
+    return DirSize(path, dir_bytes, _blocks(dir_stat) * 512 + scan.allocated,
+                   unique, scan.files, [subdir for subdir, _ in scan.subdirs],
+                   scan.largest)
+
+
+def _walk_serial(starts, cache=None, top_files=0, rules=None, stop=None):
+    """Make a generator of the sizes of each directory, without threads.
+
+    The same as walk_sizes, but the directories pending to list are kept in a
+    stack, there is no limit for the depth of the tree.
+
+    """
+    stack, seen = list(starts), set()
+    try:
+        while stack:
+            path, dir_stat, depth = stack.pop()
+            leaf = rules.leaf(depth) if rules else False
+            cached = (cache.get(path, dir_stat, top_files, rules)
+                      if cache and not leaf else None)
+            scan = scan_dir(path, cached, top_files, rules, leaf, stop)
+            stack.extend((subdir, subdir_stat, depth + 1)
+                         for subdir, subdir_stat in scan.subdirs)
+            yield _dir_size(path, dir_stat, scan, seen, cache, rules, leaf)
+    finally:
+        if cache:
+            cache.commit()
+
+
+def walk_sizes(the_path, workers=8, cache=None, top_files=0, rules=None,
+               resume=None, stop=None):
+    """Make a generator of the sizes of each directory of a tree.
+
+    Yield a DirSize for each directory. The directories are yielded in the
+    order they are listed, not in a predictable order, but always after their
+    parent directory. A single file is yielded as a directory without
+    entries. The size of a tree is the sum of the bytes of all of them.
+
+    (int) workers -- The number of threads listing directories at once. With
+                     one (or less) the tree is walked in this thread
+    (SizeCache) cache -- Reuse the directories not modified since the last
+                         walk, instead of listing them again
+    (int) top_files -- The number of the largest files of each directory to
+                       keep in its DirSize
+    (PruneRules) rules -- The rules to prune the walk
+    (list) resume -- The (path, depth) of the directories pending to list of
+                     a walk of the_path that was stopped. Only these
+                     directories (and their subtrees) are walked
+    (function) stop -- Stop the listing of each directory when it returns
+                       True, as in scan_dir. The walk itself goes on until
+                       the generator is closed
+
+    """
+    root_stat = os.stat(the_path)
+    if not stat.S_ISDIR(root_stat.st_mode):
+        yield DirSize(the_path, root_stat.st_size, _blocks(root_stat) * 512,
+                      root_stat.st_size, 0, [], [])
+        return
+    rules = rules.for_root(root_stat) if rules else None
+    starts = [(the_path, root_stat, 0)] if resume is None else []
+    for path, depth in resume or ():
+        try:
+            dir_stat = root_stat if path == the_path else os.lstat(path)
+        except OSError:
+            # Removed since the walk was stopped
+            continue
+        if stat.S_ISDIR(dir_stat.st_mode):
+            starts.append((path, dir_stat, depth))
+    if workers <= 1:
+        for dir_size in _walk_serial(starts, cache, top_files, rules,
+                                     stop):
+            yield dir_size
+        return
+
+    # Each finished listing is queued by its callback, thus the main thread
+    # waits for any of them in O(1), whatever the number of pending listings
+    done, seen = Queue(), set()
+
+    def submit(path, dir_stat, depth):
+        """Send a directory to the pool of threads to be listed."""
+        leaf = rules.leaf(depth) if rules else False
+        cached = (cache.get(path, dir_stat, top_files, rules)
+                  if cache and not leaf else None)
+        future = pool.submit(scan_dir, path, cached, top_files, rules, leaf,
+                             stop)
+        future.add_done_callback(lambda ftr: done.put((path, dir_stat, depth,
+                                                       leaf, ftr)))
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for path, dir_stat, depth in starts:
+            submit(path, dir_stat, depth)
+        pending = len(starts)
+        while pending:
+            path, dir_stat, depth, leaf, future = done.get()
+            scan = future.result()
+            for subdir, subdir_stat in scan.subdirs:
+                submit(subdir, subdir_stat, depth + 1)
+            pending += len(scan.subdirs) - 1
+            yield _dir_size(path, dir_stat, scan, seen, cache, rules, leaf)
+    finally:
+        # If the walk is stopped before the end (the generator is closed), the
+        # directories still queued are not listed
+        try:
+            pool.shutdown(cancel_futures=True)
+        except TypeError:
+            # Before Python 3.9, the queued directories are listed anyway
+            pool.shutdown()
+        if cache:
+            cache.commit()
+
+
+def get_size_parallel(the_path, workers=8, cache=None, rules=None):
+    """Get size of a directory tree or a file in bytes."""
+    return sum(dir_size.bytes for dir_size in
+               walk_sizes(the_path, workers, cache, rules=rules))
+
+
+def get_size_all(the_path, workers=8, cache=None, rules=None):
+    """Get the apparent, allocated & unique sizes of a tree in one walk.
+
+    Return a dictionary with the sizes in bytes, as:
+
+    "bytes" -- The apparent size, each hard link counted (like "du -bs -l")
+    "allocated" -- The size allocated in disk (like "du -B1 -s -l")
+    "unique" -- The apparent size, each file counted once (like "du -bs")
+
+    """
+    sizes = {"bytes": 0, "allocated": 0, "unique": 0}
+    for dir_size in walk_sizes(the_path, workers, cache, rules=rules):
+        sizes["bytes"] += dir_size.bytes
+        sizes["allocated"] += dir_size.allocated
+        sizes["unique"] += dir_size.unique
+    return sizes
+
+
+# The largest files & directories of a tree, found in the same walk that gets
+# their sizes. Two min-heaps never longer than top_n, thus the memory needed
+# depends on top_n and not on the size of the tree
+class TopSizes:
+    """Create a TopSizes object that keeps the N largest files & directories.
+
+    The files & directories are added as they are found, only the top_n
+    largest of each are kept.
+
+    """
+
+    def __init__(self, top_n=10):
+        """Create the object TopSizes itself.
+
+        (int) top_n -- The number of files & directories to keep
+
+        """
+        self.top_n = top_n
+        self.__files = []
+        self.__dirs = []
+
+    def __push(self, heap, size, path):
+        """Add a (size, path) to a heap if it's one of the top_n largest."""
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, (size, path))
+        elif self.top_n and size > heap[0][0]:
+            heapq.heapreplace(heap, (size, path))
+
+    def add_file(self, size, path):
+        """Add a file, with its size in bytes."""
+        self.__push(self.__files, size, path)
+
+    def add_dir(self, size, path):
+        """Add a directory, with the size in bytes of its whole subtree."""
+        self.__push(self.__dirs, size, path)
+
+    def files(self):
+        """Get the (bytes, path) of the largest files, largest first."""
+        return sorted(self.__files, reverse=True)
+
+    def dirs(self):
+        """Get the (bytes, path) of the largest directories, largest first."""
+        return sorted(self.__dirs, reverse=True)
+
+
+# The size of every directory of a tree in a single pass. Each directory is
+# listed and each entry is stat'ed only once, the sizes are rolled up from the
+# leaves to the root after the walk. A directory is always yielded before its
+# subdirectories, thus the reverse order of the walk is a bottom-up order.
+def get_dir_sizes(the_path, workers=8, cache=None, top=None, rules=None):
+    """Get the size of every directory of a tree in bytes.
+
+    Return a dictionary with the path of each directory (including the_path
+    itself) as key and the size in bytes of its whole subtree as value, the
+    same value that get_size would return for that directory.
+
+    (int) workers -- The number of threads listing directories at once
+    (SizeCache) cache -- Reuse the directories not modified since the last run
+    (TopSizes) top -- Keep here the largest files & directories (but the_path
+                      itself) of the tree
+    (PruneRules) rules -- The rules to prune the walk
+
+    """
+    sizes, order = {}, []
+    for dir_size in walk_sizes(the_path, workers, cache,
+                               top.top_n if top else 0, rules):
+        sizes[dir_size.path] = dir_size.bytes
+        order.append((dir_size.path, dir_size.subdirs))
+        for file_size, file_path in dir_size.largest:
+            top.add_file(file_size, file_path)
+    for path, subdirs in reversed(order):
+        sizes[path] += sum(sizes[subdir] for subdir in subdirs)
+        if top and path != the_path:
+            top.add_dir(sizes[path], path)
+    return sizes
+
+
+# Several trees at once, each one in its own process (or each one of their
+# top-level directories, to split a large tree), thus the trees in distinct
+# disks or NFS servers are walked at the same time and not one after another.
+# Each process walks its shard with its own pool of threads, and their sizes
+# are merged when all of them are finished
+def _shard_sizes(the_path, workers, rules, dir_sizes):
+    """Get the sizes of a shard of get_dir_sizes_multi, in its own process."""
+    if dir_sizes:
+        return get_dir_sizes(the_path, workers, rules=rules)
+    return {the_path: get_size_parallel(the_path, workers, rules=rules)}
+
+
+def get_dir_sizes_multi(roots, processes=None, workers=8, rules=None,
+                        split=False, dir_sizes=True):
+    """Get the size of several trees, walking them in a pool of processes.
+
+    Return a dictionary like get_dir_sizes with all the directories of all
+    the trees, or only with the roots if dir_sizes is False.
+
+    (list) roots -- The paths of the trees, must not be nested
+    (int) processes -- The number of processes, by default one for each
+                       shard up to the number of CPUs
+    (int) workers -- The number of threads of each process
+    (PruneRules) rules -- The rules to prune the walks
+    (bool) split -- Make a shard of each top-level directory of the roots,
+                    instead of one for each root
+    (bool) dir_sizes -- Get the size of each directory, not only the roots
+
+    """
+    shards, tops = [], {}
+    for root in roots:
+        root_stat = os.stat(root)
+        if (split and stat.S_ISDIR(root_stat.st_mode) and
+                not (rules and rules.leaf(0))):
+            # The root itself is listed here, and its subdirectories are one
+            # level deeper in their own walks
+            scan = scan_dir(root, rules=rules.for_root(root_stat)
+                            if rules else None)
+            subdirs = [subdir for subdir, _ in scan.subdirs]
+            tops[root] = (root_stat.st_size + scan.bytes, subdirs)
+            shard_rules = rules and PruneRules(
+                rules.excludes, None if rules.max_depth is None else
+                rules.max_depth - 1, rules.one_fs)
+            shards.extend((subdir, shard_rules) for subdir in subdirs)
         else:
-            yield os.lstat(the_path).st_size
+            shards.append((root, rules))
+
+    sizes = {}
+    processes = processes or max(1, min(len(shards), cpu_count()))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_shard_sizes, shard, workers, shard_rules,
+                               dir_sizes) for shard, shard_rules in shards]
+        for future in futures:
+            sizes.update(future.result())
+    for root, (root_bytes, subdirs) in tops.items():
+        sizes[root] = root_bytes + sum(sizes[subdir] for subdir in subdirs)
+    if not dir_sizes:
+        sizes = dict((root, sizes[root]) for root in roots)
+    return sizes
+
+
+def get_size_multi(roots, processes=None, workers=8, rules=None, split=False):
+    """Get size of several trees in bytes, walking them in several processes.
+
+    Return a dictionary with each root and its size. The arguments are the
+    same as get_dir_sizes_multi.
+
+    """
+    return get_dir_sizes_multi(roots, processes, workers, rules, split,
+                               dir_sizes=False)
+
+
+# The size of a huge tree step by step. The running totals are yielded each
+# few seconds while the tree is walked, and the walk can be stopped at any time
+# (cancelled, out of time or simply closing the generator). The last totals
+# yielded are the result, marked as partial if the walk has not been completed.
+# The deadline & the cancel event are checked while each directory is listed,
+# each STOP_ENTRIES entries, thus even the listing of a huge directory (and of
+# those listed at once by the other threads) is stopped at once. The totals
+# include the entries listed until then
+def walk_progress(the_path, interval=1.0, deadline=None, cancel=None,
+                  workers=8, cache=None, rules=None):
+    """Make a generator of the running totals of the size of a tree.
+
+    Yield a dictionary with these keys/values each interval seconds, and a
+    last one when the walk ends:
+
+    "bytes" -- (int) The size in bytes of the entries walked until now
+    "allocated" -- (int) The bytes allocated in disk of these entries
+    "unique" -- (int) The bytes, counting once the files with hard links
+    "files" -- (int) The number of entries that are not directories
+    "dirs" -- (int) The number of directories
+    "entries_sec" -- (float) The entries (files & dirs) walked per second
+    "elapsed" -- (float) The seconds since the walk started
+    "done" -- (bool) If this is the last dictionary
+    "partial" -- (bool) If the walk has been stopped before the end
+
+    (float) interval -- The seconds between two dictionaries. The totals are
+                        updated each time a directory has been listed, thus
+                        while a directory with millions of entries is listed
+                        the interval can be longer
+    (float) deadline -- Stop the walk at this time (as from time.time())
+    (threading.Event) cancel -- Stop the walk when this event is set
+    (int) workers -- The number of threads listing directories at once
+    (SizeCache) cache -- Reuse the directories not modified since the last run
+    (PruneRules) rules -- The rules to prune the walk
+
+    """
+    totals = {"bytes": 0, "allocated": 0, "unique": 0, "files": 0, "dirs": 0,
+              "entries_sec": 0.0, "elapsed": 0.0, "done": False,
+              "partial": False}
+    time_start = time_last = time.time()
+
+    def stop():
+        """Check if the walk must be stopped."""
+        return ((deadline is not None and time.time() >= deadline) or
+                (cancel is not None and cancel.is_set()))
+
+    walk = walk_sizes(the_path, workers, cache, rules=rules, stop=stop)
+    try:
+        for dir_size in walk:
+            totals["bytes"] += dir_size.bytes
+            totals["allocated"] += dir_size.allocated
+            totals["unique"] += dir_size.unique
+            totals["files"] += dir_size.files
+            totals["dirs"] += 1
+            now = time.time()
+            totals["elapsed"] = now - time_start
+            totals["entries_sec"] = ((totals["files"] + totals["dirs"]) /
+                                     max(totals["elapsed"], 1e-9))
+            if stop():
+                totals["partial"] = True
+                break
+            if now - time_last >= interval:
+                time_last = now
+                yield dict(totals)
+    finally:
+        walk.close()
+    totals["done"] = True
+    yield totals
+
+
+def get_size_progress(the_path, callback=None, **kwargs):
+    """Get the size of a tree in bytes, reporting the progress of the walk.
+
+    (function) callback -- Called with the running totals of walk_progress
+                           each interval seconds
+
+    The keyword arguments are passed to walk_progress. Return the last
+    dictionary of walk_progress, with "partial" True if it was stopped.
+
+    """
+    for totals in walk_progress(the_path, **kwargs):
+        if not totals["done"] and callback:
+            callback(totals)
+    return totals
+
+
+# A persistent cache for the scandir engine. Stores for each directory its
+# (dev, inode, mtime), the bytes of its entries that aren't directories and the
+# names of its subdirectories. A directory whose mtime has not changed has the
+# same entries, thus it's not listed again, only its subdirectories are stat'ed
+# to check them in turn. A walk of an unchanged tree is one lstat per dir.
+# Beware, the mtime of a directory does not change when one of its files grows
+# or shrinks in place (e.g. a log file), only when an entry is added, removed
+# or renamed. Is accurate for trees whose files are replaced, not rewritten in
+# place (e.g. rsync copies)
+class SizeCache:
+    """Create a SizeCache object that stores the directories walked in a file.
+
+    The cache is a sqlite database, the directories are stored with the same
+    path that was used to walk them.
+
+    """
+
+    # The mtime resolution of some filesystems is coarse, so a directory
+    # modified in the same instant of the walk could look unchanged later
+    racy_secs = 2
+
+    # The layout of the table, a database of other version is discarded
+    version = 2
+
+    def __init__(self, filename=".dir_sizes.db"):
+        """Create the object SizeCache itself & open (or create) the database.
+
+        (str) filename -- The file of the sqlite database
+
+        """
+        self.filename = filename
+        self.__db = sqlite3.connect(filename)
+        if self.__db.execute("PRAGMA user_version").fetchone()[0] != \
+                self.version:
+            self.__db.execute("DROP TABLE IF EXISTS dirs")
+            self.__db.execute("PRAGMA user_version = {0:d}".format(
+                self.version))
+        self.__db.execute("CREATE TABLE IF NOT EXISTS dirs (path BLOB PRIMARY"
+                          " KEY, dev INTEGER, ino INTEGER, mtime INTEGER, "
+                          "bytes INTEGER, allocated INTEGER, files INTEGER, "
+                          "top INTEGER, largest BLOB, links BLOB, subdirs "
+                          "BLOB, rules TEXT)")
+
+    @staticmethod
+    def __mtime(dir_stat):
+        """Get the most precise mtime available in a stat result."""
+        return getattr(dir_stat, "st_mtime_ns", dir_stat.st_mtime)
+
+    @staticmethod
+    def __split(blob):
+        """Split a list of names stored in a BLOB."""
+        return [fsdecode(name) for name in bytes(blob).split(b"\0")] if blob \
+            else []
+
+    def get(self, path, dir_stat, top_files=0, rules=None):
+        """Get the directory stored if it has not been modified.
+
+        (str) path -- The path of the directory
+        (stat_result) dir_stat -- The current stat of the directory
+        (int) top_files -- The number of the largest files needed
+        (PruneRules) rules -- The rules to prune the walk
+
+        Return a DirScan without subdirs, and the largest files with their
+        names instead of their paths. None if the directory is unknown, has
+        been modified, was stored with less largest files than top_files or
+        with other rules.
+
+        """
+        row = self.__db.execute("SELECT dev, ino, mtime, bytes, allocated, "
+                                "files, top, largest, links, subdirs, rules "
+                                "FROM dirs WHERE path = ?",
+                                (sqlite3.Binary(fsencode(path)),)).fetchone()
+        if row is None or tuple(row[:3]) != (dir_stat.st_dev, dir_stat.st_ino,
+                                             self.__mtime(dir_stat)):
+            return None
+        if row[6] < top_files or row[10] != repr(rules):
+            return None
+        largest, links = self.__split(row[7]), self.__split(row[8])
+        return DirScan(row[3], row[4], row[5],
+                       list(zip((int(size) for size in largest[::2]),
+                                largest[1::2])),
+                       list(zip((int(inode) for inode in links[::2]),
+                                (int(size) for size in links[1::2]))),
+                       None, self.__split(row[9]))
+
+    def put(self, path, dir_stat, scan, rules=None):
+        """Store a directory that has just been listed.
+
+        (str) path -- The path of the directory
+        (stat_result) dir_stat -- The stat of the directory when was listed
+        (DirScan) scan -- The entries of the directory
+        (PruneRules) rules -- The rules used to list the directory
+
+        """
+        names = scan.names
+        key = fsencode(path)
+        row = self.__db.execute("SELECT subdirs FROM dirs WHERE path = ?",
+                                (sqlite3.Binary(key),)).fetchone()
+        if row and row[0]:
+            # Forget the subdirectories that are gone since the last walk
+            for name in set(bytes(row[0]).split(b"\0")).difference(
+                    fsencode(name) for name in names):
+                self.prune(os.path.join(path, fsdecode(name)))
+        if time.time() - dir_stat.st_mtime < self.racy_secs:
+            self.__db.execute("DELETE FROM dirs WHERE path = ?",
+                              (sqlite3.Binary(key),))
+            return
+        # The largest files are stored as "bytes\0name\0bytes\0name...", and
+        # the links as "inode\0bytes\0inode\0bytes...". If all the files are
+        # in largest, they are enough for any top_files
+        top = (len(scan.largest) if len(scan.largest) < scan.files else
+               sys.maxsize)
+        largest = b"\0".join(fsencode("{0}\0{1}".format(
+            size, os.path.basename(file_path)))
+            for size, file_path in scan.largest)
+        links = b"\0".join(fsencode("{0}\0{1}".format(inode, size))
+                           for inode, size in scan.links)
+        names = b"\0".join(fsencode(name) for name in names)
+        self.__db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, "
+                          "?, ?, ?, ?, ?, ?, ?)",
+                          (sqlite3.Binary(key), dir_stat.st_dev,
+                           dir_stat.st_ino, self.__mtime(dir_stat), scan.bytes,
+                           scan.allocated, scan.files, top,
+                           sqlite3.Binary(largest), sqlite3.Binary(links),
+                           sqlite3.Binary(names), repr(rules)))
 
-    return sum(get_sizes(the_path))
+    def prune(self, path):
+        """Remove a directory and all the directories below it."""
+        key = fsencode(path).rstrip(b"/")
+        # All the paths below key are between "key/" and "key0" ("0" follows
+        # "/" in ASCII), thus the primary key index is used
+        self.__db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND "
+                          "path < ?)", (sqlite3.Binary(key),
+                                        sqlite3.Binary(key + b"/"),
+                                        sqlite3.Binary(key + b"0")))
+
+    def commit(self):
+        """Save the changes in the database file."""
+        self.__db.commit()
+
+    def close(self):
+        """Save the changes & close the database file."""
+        self.__db.commit()
+        self.__db.close()
+
+
+# A walk of the scandir engine that survives being stopped (killed, out of
+# time, a crash...). Each interval seconds, the directories walked since the
+# last checkpoint and the directories pending to list (only the frontier of
+# the walk) are saved in a sqlite database, in a single transaction. A new
+# walk of the same path with the same checkpoint yields first the directories
+# already walked, without listing them, and then walks only those pending.
+# The cost of each checkpoint depends on the directories walked since the last
+# one, not on the whole walk. Beware, the hard links found before and after a
+# resume are not matched, the unique size of the whole walk could count some
+# of them twice. A walk stopped too long ago is started again, its sizes would
+# be mixed with those of now
+class ScanCheckpoint:
+    """Create a ScanCheckpoint object that stores the progress of a walk.
+
+    The checkpoint is a sqlite database, with the progress of only one walk.
+
+    """
+
+    # The layout of the tables, a database of other version is discarded
+    version = 2
+
+    def __init__(self, filename=".dir_sizes.ckpt"):
+        """Create the object ScanCheckpoint itself & open (or create) the db.
+
+        (str) filename -- The file of the sqlite database
+
+        """
+        self.filename = filename
+        self.__db = sqlite3.connect(filename)
+        if self.__db.execute("PRAGMA user_version").fetchone()[0] != \
+                self.version:
+            self.__db.executescript("""
+                DROP TABLE IF EXISTS walk;
+                DROP TABLE IF EXISTS done;
+                DROP TABLE IF EXISTS pending;
+                PRAGMA user_version = {0:d};
+                """.format(self.version))
+        self.__db.executescript("""
+            CREATE TABLE IF NOT EXISTS walk (config TEXT, started REAL);
+            CREATE TABLE IF NOT EXISTS done (seq INTEGER PRIMARY KEY,
+                                             path BLOB, bytes INTEGER,
+                                             allocated INTEGER,
+                                             uniq INTEGER, files INTEGER,
+                                             subdirs BLOB, largest BLOB);
+            CREATE TABLE IF NOT EXISTS pending (path BLOB PRIMARY KEY,
+                                                depth INTEGER);
+            """)
+
+    def pending(self, config, max_age=None):
+        """Get the (path, depth) of the directories pending to list.
+
+        (str) config -- The path & arguments of the walk
+        (float) max_age -- The seconds since the walk started after which its
+                           sizes are too old to go on with it (no limit if
+                           None)
+
+        None if there is no walk stopped with this same config (or too old).
+
+        """
+        row = self.__db.execute("SELECT config, started FROM walk").fetchone()
+        if row is None or row[0] != config:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return [(fsdecode(bytes(path)), depth) for path, depth in
+                self.__db.execute("SELECT path, depth FROM pending")]
+
+    def done(self):
+        """Make a generator of the DirSize of the directories walked."""
+        for row in self.__db.execute("SELECT path, bytes, allocated, uniq, "
+                                     "files, subdirs, largest FROM done "
+                                     "ORDER BY seq"):
+            path = fsdecode(bytes(row[0]))
+            subdirs = [os.path.join(path, name) for name in
+                       fsdecode(bytes(row[5])).split("\0") if name]
+            largest = fsdecode(bytes(row[6])).split("\0") if row[6] else []
+            yield DirSize(path, row[1], row[2], row[3], row[4], subdirs,
+                          [(int(size), os.path.join(path, name)) for
+                           size, name in zip(largest[::2], largest[1::2])])
+
+    def start(self, config):
+        """Forget any walk stopped & start a new one."""
+        with self.__db:
+            self.__db.execute("DELETE FROM walk")
+            self.__db.execute("DELETE FROM done")
+            self.__db.execute("DELETE FROM pending")
+            self.__db.execute("INSERT INTO walk VALUES (?, ?)",
+                              (config, time.time()))
+
+    def save(self, walked, pending):
+        """Save the progress of the walk.
+
+        (list) walked -- The DirSize of the directories walked since the last
+                         save
+        (dict) pending -- The depth of each directory pending to list
+
+        """
+        with self.__db:
+            self.__db.executemany(
+                "INSERT INTO done (path, bytes, allocated, uniq, files, "
+                "subdirs, largest) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((sqlite3.Binary(fsencode(dir_size.path)), dir_size.bytes,
+                  dir_size.allocated, dir_size.unique, dir_size.files,
+                  sqlite3.Binary(fsencode("\0".join(
+                      os.path.basename(subdir) for subdir in
+                      dir_size.subdirs))),
+                  sqlite3.Binary(fsencode("\0".join(
+                      "{0}\0{1}".format(size, os.path.basename(file_path))
+                      for size, file_path in dir_size.largest))))
+                 for dir_size in walked))
+            self.__db.execute("DELETE FROM pending")
+            self.__db.executemany("INSERT INTO pending VALUES (?, ?)",
+                                  ((sqlite3.Binary(fsencode(path)), depth)
+                                   for path, depth in pending.items()))
+
+    def finish(self):
+        """Forget the walk, it has been completed."""
+        with self.__db:
+            self.__db.execute("DELETE FROM walk")
+            self.__db.execute("DELETE FROM done")
+            self.__db.execute("DELETE FROM pending")
+
+    def close(self):
+        """Close the database file."""
+        self.__db.close()
+
+
+def walk_resumable(the_path, checkpoint, interval=60.0, workers=8, cache=None,
+                   top_files=0, rules=None, max_age=24 * 60 * 60):
+    """Make a generator of the sizes of each directory, resuming a walk.
+
+    The same as walk_sizes, but if the walk of the_path with the same
+    arguments was stopped, it goes on from its last checkpoint. The progress
+    is saved each interval seconds, and when the generator is stopped.
+
+    (ScanCheckpoint) checkpoint -- Where the progress of the walk is saved
+    (float) interval -- The seconds between two checkpoints
+    (float) max_age -- Start again a walk stopped that started more than
+                       these seconds ago (a day by default, no limit if None)
+
+    A walk stopped is also started again if the_path is now other directory
+    (other device or inode).
+
+    """
+    root_stat = os.stat(the_path)
+    config = repr((os.path.abspath(the_path), root_stat.st_dev,
+                   root_stat.st_ino, top_files, repr(rules),
+                   rules.max_depth if rules else None))
+    resume = checkpoint.pending(config, max_age)
+    if resume is None:
+        checkpoint.start(config)
+        pending = {the_path: 0}
+    else:
+        for dir_size in checkpoint.done():
+            yield dir_size
+        pending = dict(resume)
+
+    walked, last, completed = [], time.time(), False
+    try:
+        for dir_size in walk_sizes(the_path, workers, cache, top_files, rules,
+                                   resume):
+            depth = pending.pop(dir_size.path, 0)
+            for subdir in dir_size.subdirs:
+                pending[subdir] = depth + 1
+            walked.append(dir_size)
+            if time.time() - last >= interval:
+                checkpoint.save(walked, pending)
+                walked, last = [], time.time()
+            yield dir_size
+        completed = True
+    finally:
+        if completed:
+            checkpoint.finish()
+        else:
+            checkpoint.save(walked, pending)
 
 
 # This converts a size in bytes to the best unit, using IEC binary prefixes.
+# The IEC prefixes, one each 10 bits, and the divisor of each one. The best
+# prefix for a size is found from the number of bits of its integer part
+# (bit_length), without a loop of divisions. Sizes of 2^90 or more are shown
+# in YiB
+IEC_UNITS = ("bytes", "KiB", "MiB", "GiB", "TiB", "PiB", "EiB", "ZiB", "YiB")
+_IEC_DIVISORS = tuple(pow(2.0, exp) for exp in range(0, 90, 10))
+
+
+def _unit_index(bytes_size):
+    """Get the index in IEC_UNITS of the best prefix for a size in bytes."""
+    return min(max(int(abs(bytes_size)).bit_length() - 1, 0) // 10, 8)
+
+
+def unit_size(bytes_size):
+    """Convert a size in bytes to the best IEC prefix, as (size, prefix)."""
+    index = _unit_index(bytes_size)
+    return abs(bytes_size) / _IEC_DIVISORS[index], IEC_UNITS[index]
+
+
 def best_unit_size(bytes_size):
     """Get a size in bytes & convert it to the best IEC prefix for readability.
 
@@ -124,18 +1191,35 @@ def best_unit_size(bytes_size):
     "b" -- (int / long) The original size in bytes
 
     """
-    for exp in range(0, 90, 10):
-        bu_size = abs(bytes_size) / pow(2.0, exp)
-        if int(bu_size) < 2 ** 10:
-            unit = {0: "bytes", 10: "KiB", 20: "MiB", 30: "GiB", 40: "TiB",
-                    50: "PiB", 60: "EiB", 70: "ZiB", 80: "YiB"}[exp]
-            break
+    bu_size, unit = unit_size(bytes_size)
     return {"s": bu_size, "u": unit, "b": bytes_size}
 
 
+def best_unit_sizes(sizes):
+    """Convert a sequence of sizes in bytes to the best IEC prefix of each.
+
+    Return a tuple of two sequences, the sizes converted (floats) and their
+    IEC prefixes (strs), in the same order. For a NumPy array both are NumPy
+    arrays, converted all at once without a python loop. Like best_unit_size,
+    the sizes converted are absolute values.
+
+    """
+    if numpy is not None and isinstance(sizes, numpy.ndarray):
+        sizes = numpy.abs(sizes.astype(numpy.float64))
+        # frexp gives the bit_length of the integer part as exponent
+        exps = numpy.frexp(numpy.floor(sizes))[1]
+        index = numpy.clip((exps - 1) // 10, 0, 8)
+        return (sizes / numpy.array(_IEC_DIVISORS)[index],
+                numpy.array(IEC_UNITS)[index])
+    divisors, units, index = _IEC_DIVISORS, IEC_UNITS, _unit_index
+    indexes = [index(size) for size in sizes]
+    return ([abs(size) / divisors[idx] for size, idx in zip(sizes, indexes)],
+            [units[idx] for idx in indexes])
+
+
 # Combination of calculating the size in bytes and conversion to best IEC
-# prefix in one function.
-def get_unit_size(the_path):
+# prefix in one function. Serial unless more workers are asked for, as get_size
+def get_unit_size(the_path, workers=1):
     """Calculate size of a directory/file & convert it for the best IEC prefix.
 
     Return a dictionary with three pair of keys/values:
@@ -146,21 +1230,7 @@ def get_unit_size(the_path):
 
     """
 
-    bytes_size = 0
-    for path, directories, files in os.walk(the_path):
-        for filename in files:
-            bytes_size += os.lstat(os.path.join(path, filename)).st_size
-        for directory in directories:
-            bytes_size += os.lstat(os.path.join(path, directory)).st_size
-    bytes_size += os.path.getsize(the_path)
-
-    for exp in range(0, 90, 10):
-        bu_size = abs(bytes_size) / pow(2.0, exp)
-        if int(bu_size) < 2 ** 10:
-            unit = {0: "bytes", 10: "KiB", 20: "MiB", 30: "GiB", 40: "TiB",
-                    50: "PiB", 60: "EiB", 70: "ZiB", 80: "YiB"}[exp]
-            break
-    return {"s": bu_size, "u": unit, "b": bytes_size}
+    return best_unit_size(get_size_parallel(the_path, workers))
 
 
 class GetSize:
@@ -188,81 +1258,25 @@ class GetSize:
     def from_bytes(self, sz_bytes):
         """Get size & IEC prefix from size in bytes."""
         self.bytes = sz_bytes
-        for exp in range(0, 90, 10):
-            self.size = abs(self.bytes) / pow(2.0, exp)
-            if int(self.size) < 2 ** 10:
-                self.unit = {0: "bytes", 10: "KiB", 20: "MiB", 30: "GiB",
-                             40: "TiB", 50: "PiB", 60: "EiB", 70: "ZiB",
-                             80: "YiB"}[exp]
-                break
+        self.size, self.unit = unit_size(sz_bytes)
+
+    def from_path(self, a_path, workers=1):
+        """Get size & IEC prefix from a directory or file.
 
-    def from_path(self, a_path):
-        """Get size & IEC prefix from a directory or file."""
-        for path, directories, files in os.walk(a_path):
-            for filename in files:
-                self.bytes += os.lstat(os.path.join(path, filename)).st_size
-            for directory in directories:
-                self.bytes += os.lstat(os.path.join(path, directory)).st_size
-        self.bytes += os.path.getsize(a_path)
+        (int) workers -- The number of threads listing directories at once,
+                         by default the tree is walked in this thread
+
+        """
+        self.bytes += get_size_parallel(a_path, workers)
         self.from_bytes(self.bytes)
 
 
 def main():
     """Main section"""
-
-    my_path = ".."
-
-    functions = [get_dir_size, get_size, get_size_fast]
-
-    def timeit(ftn, *args):
-        """Get time consumed by a function."""
-        time_start = time.time()
-        sz_du = ftn(args[0])
-        time_end = time.time()
-        return sz_du, time_end - time_start
-
-    # Show results from standard *NIX command 'du'
-    print("  Space     in bytes       'du' Diff      Time")
-    print("  =====     ========       =========      ====")
-    print("$ du -bs".center(50) + os.linesep + ("-" * 8).center(50))
-    tm_du_start = time.time()
-    bytes_du = int(Popen(["du", "-bs", my_path], stdout=PIPE).stdout.
-                   readlines()[0].split()[0])
-    tm_du = time.time() - tm_du_start
-    sz_du = best_unit_size(bytes_du)
-    print("{0:.1f} {1} {2:12}         n/a {3:12.4f}s".
-          format(sz_du["s"], sz_du["u"], sz_du["b"], tm_du) + os.linesep)
-
-    # Show results of the distinct Python methods to compare speed & precision
-    for fnct in functions:
-        fname = fnct.__name__
-        print(fname.center(50) + os.linesep + ("-" * len(fname)).center(50))
-        bytes_fn, time_fn = timeit(fnct, my_path)
-        sz_fn = best_unit_size(bytes_fn)
-        diff_fn = best_unit_size(bytes_du - sz_fn["b"])
-        print("{0:.1f} {1} {2:12} {3:10.2f} {4:5}{5:8.4f}s".
-              format(sz_fn["s"], sz_fn["u"], sz_fn["b"], diff_fn["s"],
-                     diff_fn["u"], time_fn) + os.linesep)
-
-    # get_unit_size as a combination of two functions requires separate code
-    print("get_unit_size".center(50) + os.linesep + ("-" * 13).center(50))
-    sz_gus, tm_gus = timeit(get_unit_size, my_path)
-    diff_gus = best_unit_size(bytes_du - sz_gus["b"])
-    print("{0:.1f} {1} {2:12} {3:10.2f} {4:5}{5:8.4f}s".
-          format(sz_gus["s"], sz_gus["u"], sz_gus["b"], diff_gus["s"],
-                 diff_gus["u"], tm_gus) + os.linesep)
-
-    # shows results from GetSize class
-    print("GetSize Class".center(50) + os.linesep + ("-" * 13).center(50))
-    time_class_start = time.time()
-    sz_class = GetSize()
-    sz_class.from_path(my_path)
-    tm_class = time.time() - time_class_start
-    diff_class = GetSize()
-    diff_class.from_bytes(bytes_du - sz_class.bytes)
-    print("{0:.1f} {1} {2:12} {3:10.2f} {4:5}{5:8.4f}s".
-          format(sz_class.size, sz_class.unit, sz_class.bytes, diff_class.size,
-                 diff_class.unit, tm_class) + os.linesep)
+    # The speed & precision of these functions, compared with the *NIX command
+    # "du -bs", are measured in a reproducible way by get_size_bench.py
+    from get_size_bench import main as bench_main
+    bench_main()
 
 
 if __name__ == "__main__":
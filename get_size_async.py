@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+"""
+    get_size_async.py: Calculate the size of directory trees inside asyncio
+"""
+
+#==============================================================================
+# The scandir engine of get_size.py for asyncio applications (e.g. a service
+# that reports the size of some paths). The directories are listed by a
+# bounded pool of threads shared by all the requests, thus the event loop is
+# never blocked and the disk is not oversubscribed, whatever the number of
+# requests at once. Each request has a limit of directories being listed at
+# once, so a huge tree does not delay the rest of requests. The requests for
+# the same path (and rules) that are already in progress are coalesced, they
+# all wait for the same walk.
+#
+# Only for Python 3.7+
+#==============================================================================
+
+#==============================================================================
+#    Copyright 2026 joe di castro <joe@joedicastro.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#==============================================================================
+
+__author__ = "joe di castro <joe@joedicastro.com>"
+__license__ = "GNU General Public License version 3"
+__date__ = "18/10/2026"
+__version__ = "0.1"
+
+try:
+    import sys
+    import os
+    import asyncio
+    import stat
+    from argparse import ArgumentParser
+    from concurrent.futures import ThreadPoolExecutor
+    from get_size import scan_dir, best_unit_size
+except ImportError:
+    # Checks the installation of the necessary python modules
+    print((os.linesep * 2).join(["An error found importing one module:",
+          str(sys.exc_info()[1]), "You need to install it", "Stopping..."]))
+    sys.exit(-2)
+
+
+class AsyncSizer:
+    """Create an AsyncSizer object that gets the size of trees in asyncio.
+
+    All the requests of the object share the same pool of threads to list
+    the directories.
+
+    """
+
+    def __init__(self, workers=8, per_request=None):
+        """Create the object AsyncSizer itself & its pool of threads.
+
+        (int) workers -- The number of threads listing directories at once
+        (int) per_request -- The maximum number of directories listed at once
+                             for a single request (workers by default)
+
+        """
+        self.workers = max(1, workers)
+        self.per_request = per_request or self.workers
+        self.__pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.__in_flight = {}
+
+    async def __walk(self, the_path, rules):
+        """Walk a tree listing its directories in the pool of threads."""
+        loop = asyncio.get_running_loop()
+        root_stat = await loop.run_in_executor(self.__pool, os.stat, the_path)
+        if not stat.S_ISDIR(root_stat.st_mode):
+            return root_stat.st_size
+        rules = rules.for_root(root_stat) if rules else None
+
+        total, stack, listing = 0, [(the_path, root_stat, 0)], {}
+        try:
+            while stack or listing:
+                # Keep up to per_request directories in the pool, the rest
+                # wait here and not in the queue of the pool
+                while stack and len(listing) < self.per_request:
+                    path, dir_stat, depth = stack.pop()
+                    leaf = rules.leaf(depth) if rules else False
+                    future = loop.run_in_executor(self.__pool, scan_dir,
+                                                  path, None, 0, rules, leaf)
+                    listing[future] = (dir_stat, depth)
+                done, _ = await asyncio.wait(
+                    listing, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    dir_stat, depth = listing.pop(future)
+                    scan = future.result()
+                    total += dir_stat.st_size + scan.bytes
+                    stack.extend((subdir, subdir_stat, depth + 1)
+                                 for subdir, subdir_stat in scan.subdirs)
+        finally:
+            for future in listing:
+                future.cancel()
+        return total
+
+    async def get_size(self, the_path, rules=None):
+        """Get size of a directory tree or a file in bytes.
+
+        (str) the_path -- The directory or file
+        (PruneRules) rules -- The rules to prune the walk
+
+        If there is already a request in progress for the same path and rules,
+        waits for its result instead of walking the tree again. Cancelling a
+        request does not cancel the walk for the rest of requests.
+
+        """
+        key = (os.path.abspath(the_path), repr(rules),
+               rules.max_depth if rules else None)
+        task = self.__in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.__walk(the_path, rules))
+            self.__in_flight[key] = task
+            task.add_done_callback(lambda tsk: self.__in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def get_unit_size(self, the_path, rules=None):
+        """Get size of a directory tree or a file in the best IEC prefix."""
+        return best_unit_size(await self.get_size(the_path, rules))
+
+    def close(self):
+        """Stop the pool of threads, once all the requests are done."""
+        self.__pool.shutdown()
+
+
+# The object shared by the module functions
+_SIZER = None
+
+
+def _sizer():
+    """Get the AsyncSizer shared by the module functions."""
+    global _SIZER
+    if _SIZER is None:
+        _SIZER = AsyncSizer()
+    return _SIZER
+
+
+async def get_size(the_path, rules=None):
+    """Get size of a directory tree or a file in bytes, without blocking."""
+    return await _sizer().get_size(the_path, rules)
+
+
+async def get_unit_size(the_path, rules=None):
+    """Get size of a directory tree or a file in the best IEC prefix."""
+    return await _sizer().get_unit_size(the_path, rules)
+
+
+def arguments():
+    """Defines the command line arguments for the script."""
+    main_desc = """Get the size of several paths at once"""
+
+    parser = ArgumentParser(description=main_desc)
+    parser.add_argument("paths", nargs="+", help="the paths to size")
+    parser.add_argument("-w", "--workers", type=int, default=8,
+                        help="the threads listing directories (default 8)")
+    parser.add_argument("-v", "--version", action="version",
+                        version="%(prog)s {0}".format(__version__),
+                        help="show program's version number and exit")
+    return parser
+
+
+async def size_paths(paths, workers):
+    """Get the size of several paths at once & print them."""
+    sizer = AsyncSizer(workers)
+    sizes = await asyncio.gather(*[sizer.get_unit_size(path)
+                                   for path in paths])
+    sizer.close()
+    for path, size in zip(paths, sizes):
+        print("{0:8.2f} {1:5} {2}".format(size["s"], size["u"], path))
+
+
+def main():
+    """Main section"""
+    args = arguments().parse_args()
+    asyncio.run(size_paths(args.paths, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python2
+# -*- coding: utf8 -*-
+
+"""
+    get_size_bench.py: Benchmark the functions of get_size.py
+"""
+
+#==============================================================================
+# A reproducible benchmark for the functions that calculate the size of a
+# directory tree in get_size.py. Makes synthetic trees of different shapes
+# (wide, deep, many small files, hardlinks, symlinks) or takes an existing
+# path, runs each function several times with the page cache warm and, when
+# is possible (root only, Linux), cold. Reports the median & 95th percentile of
+# the times, the syscalls made (if strace is installed) and the difference with
+# the *NIX command "du -bs". The results can be saved as JSON to compare them
+# with the results of another version and track regressions.
+#==============================================================================
+
+#==============================================================================
+#    Copyright 2026 joe di castro <joe@joedicastro.com>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#==============================================================================
+
+__author__ = "joe di castro <joe@joedicastro.com>"
+__license__ = "GNU General Public License version 3"
+__date__ = "18/10/2026"
+__version__ = "0.1"
+
+try:
+    import sys
+    import os
+    import json
+    import platform
+    import random
+    import re
+    import shutil
+    import tempfile
+    import time
+    from argparse import ArgumentParser
+    from collections import Counter
+    from subprocess import Popen, PIPE
+    import get_size
+except ImportError:
+    # Checks the installation of the necessary python modules
+    print((os.linesep * 2).join(["An error found importing one module:",
+          str(sys.exc_info()[1]), "You need to install it", "Stopping..."]))
+    sys.exit(-2)
+
+
+# The shapes of the synthetic trees. Each level of the tree has "dirs"
+# subdirectories per directory, down to "depth" levels, and each directory has
+# "files" files of up to "size" bytes. Some of the files have "links" extra
+# hard links and some of the directories have "symlinks" symbolic links (to a
+# file, to a directory and a dangling one)
+SHAPES = {
+    "wide": {"depth": 1, "dirs": 500, "files": 20, "size": 8192},
+    "deep": {"depth": 300, "dirs": 1, "files": 4, "size": 8192},
+    "small": {"depth": 3, "dirs": 8, "files": 40, "size": 64},
+    "hardlinks": {"depth": 2, "dirs": 10, "files": 20, "size": 8192,
+                  "links": 3},
+    "symlinks": {"depth": 2, "dirs": 10, "files": 20, "size": 8192,
+                 "symlinks": 3},
+}
+
+
+def _class_size(the_path):
+    """Get size of a directory tree or a file in bytes with GetSize."""
+    sz_class = get_size.GetSize()
+    sz_class.from_path(the_path)
+    return sz_class.bytes
+
+
+# The functions to benchmark, all of them return the size in bytes
+FUNCTIONS = [
+    ("get_dir_size", get_size.get_dir_size),
+    ("get_size", get_size.get_size),
+    ("get_size_fast", get_size.get_size_fast),
+    ("get_size_parallel", get_size.get_size_parallel),
+    ("get_unit_size", lambda the_path: get_size.get_unit_size(the_path)["b"]),
+    ("GetSize", _class_size),
+]
+
+
+def arguments():
+    """Defines the command line arguments for the script."""
+    main_desc = """Benchmark the functions of get_size.py"""
+
+    parser = ArgumentParser(description=main_desc)
+    parser.add_argument("-p", "--path", dest="path", default=None,
+                        help="benchmark an existing tree instead of the "
+                        "synthetic ones")
+    parser.add_argument("-s", "--shape", dest="shapes", action="append",
+                        choices=sorted(SHAPES),
+                        help="the synthetic tree to benchmark (repeat the "
+                        "option for several). All of them if none is given")
+    parser.add_argument("-r", "--repeat", dest="repeat", type=int, default=5,
+                        help="times that each function runs (default 5)")
+    parser.add_argument("-o", "--output", dest="output",
+                        help="save the results in this JSON file")
+    parser.add_argument("-c", "--compare", dest="compare",
+                        help="compare the medians with a previous JSON file")
+    parser.add_argument("--cold", dest="cold", action="store_true",
+                        help="also run with the page cache dropped before "
+                        "each run (needs root)")
+    parser.add_argument("--strace", dest="strace", action="store_true",
+                        help="count the syscalls of each function (needs "
+                        "strace)")
+    parser.add_argument("--seed", dest="seed", type=int, default=0,
+                        help="seed for the sizes of the synthetic files")
+    parser.add_argument("-v", "--version", action="version",
+                        version="%(prog)s {0}".format(__version__),
+                        help="show program's version number and exit")
+    return parser
+
+
+def make_tree(path, depth, dirs, files, size, links=0, symlinks=0, seed=0):
+    """Make a synthetic directory tree for the benchmark.
+
+    (str) path -- The root of the tree, is created if not exists
+    (int) depth -- The number of levels of directories below the root
+    (int) dirs -- The number of subdirectories of each directory
+    (int) files -- The number of files of each directory
+    (int) size -- The maximum size of each file in bytes
+    (int) links -- The extra hard links of every fourth file
+    (int) symlinks -- The symbolic links of each directory
+    (int) seed -- The seed for the random sizes, for reproducible trees
+
+    Return the number of entries (directories, files & links) created.
+
+    """
+    rnd = random.Random(seed)
+    entries = 0
+    level = [path]
+    if not os.path.exists(path):
+        os.mkdir(path)
+    for lvl in range(depth + 1):
+        next_level = []
+        for directory in level:
+            for num in range(files):
+                filename = os.path.join(directory, "f{0}".format(num))
+                with open(filename, "wb") as out:
+                    out.write(b"0" * rnd.randint(0, size))
+                entries += 1
+                for lnk in range(links if not num % 4 else 0):
+                    os.link(filename, "{0}.l{1}".format(filename, lnk))
+                    entries += 1
+            for num in range(symlinks):
+                target = ["f0", os.pardir, "missing"][num % 3]
+                os.symlink(target, os.path.join(directory, "s{0}".format(num)))
+                entries += 1
+            if lvl < depth:
+                for num in range(dirs):
+                    subdir = os.path.join(directory, "d{0}".format(num))
+                    os.mkdir(subdir)
+                    next_level.append(subdir)
+                    entries += 1
+        level = next_level
+    return entries
+
+
+def du_size(the_path):
+    """Get size of a tree in bytes with "du -bs", None if it's not possible."""
+    try:
+        out = Popen(["du", "-bs", the_path], stdout=PIPE,
+                    stderr=PIPE).communicate()[0]
+        return int(out.split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def drop_caches():
+    """Drop the page, dentry & inode caches. Only for root in Linux.
+
+    Return True if the caches have been dropped.
+
+    """
+    try:
+        os.system("sync")
+        with open("/proc/sys/vm/drop_caches", "w") as drop:
+            drop.write("3")
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def percentile(values, pct):
+    """Get the percentile of a list of values (nearest rank method)."""
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def time_function(fnct, the_path, repeat, cold=False):
+    """Run a function several times & get the times and the size returned.
+
+    Return a tuple with the size in bytes and a dictionary with the times of
+    each run, the median and the 95th percentile, or None if the page cache
+    had to be dropped and it's not possible.
+
+    """
+    times, bytes_fn = [], None
+    for run in range(repeat):
+        if cold and not drop_caches():
+            return bytes_fn, None
+        time_start = time.time()
+        bytes_fn = fnct(the_path)
+        times.append(time.time() - time_start)
+    return bytes_fn, {"runs": times, "median": percentile(times, 50),
+                      "p95": percentile(times, 95)}
+
+
+def run_function(name, the_path):
+    """Run one of the functions by its name. Used under strace."""
+    dict(FUNCTIONS)[name](the_path)
+
+
+def count_syscalls(name, the_path):
+    """Count the syscalls made by a function, None if strace isn't installed.
+
+    The syscalls of a python process that only imports the modules are
+    subtracted, thus the counts are only for the function itself.
+
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    setup = ("import sys; sys.path.insert(0, {0!r}); import get_size_bench".
+             format(here))
+    run = "{0}; get_size_bench.run_function({1!r}, {2!r})".format(setup, name,
+                                                                  the_path)
+    counts = []
+    for code in (run, setup):
+        fd, trace = tempfile.mkstemp(suffix=".strace")
+        os.close(fd)
+        try:
+            Popen(["strace", "-f", "-qq", "-o", trace, sys.executable, "-c",
+                   code], stdout=PIPE, stderr=PIPE).communicate()
+            with open(trace) as trace_file:
+                counts.append(Counter(match.group(1) for match in
+                                      (re.match(r"(?:\d+\s+)?(\w+)\(", line)
+                                       for line in trace_file) if match))
+        except OSError:
+            return None
+        finally:
+            os.remove(trace)
+    syscalls = counts[0] - counts[1]
+    result = dict(syscalls)
+    result["total"] = sum(syscalls.values())
+    return result
+
+
+def bench_tree(the_path, repeat, cold=False, strace=False):
+    """Benchmark all the functions for a tree.
+
+    Return a dictionary with the size from "du" and the results of each
+    function (size, difference with "du", warm & cold times and syscalls).
+
+    """
+    bytes_du = du_size(the_path)
+    results = {"path": the_path, "du": bytes_du, "functions": {}}
+    for name, fnct in FUNCTIONS:
+        try:
+            fnct(the_path)  # Warm up the page cache
+        except OSError:
+            # e.g. get_dir_size follows the symbolic links, even the dangling
+            results["functions"][name] = {"error": str(sys.exc_info()[1])}
+            continue
+        bytes_fn, warm = time_function(fnct, the_path, repeat)
+        results["functions"][name] = {
+            "bytes": bytes_fn,
+            "du_diff": bytes_du - bytes_fn if bytes_du is not None else None,
+            "warm": warm,
+            "cold": time_function(fnct, the_path, repeat, True)[1]
+            if cold else None,
+            "syscalls": count_syscalls(name, the_path) if strace else None
+        }
+    return results
+
+
+def report(title, results, previous=None):
+    """Print the results of a tree in a table, like get_size.main did."""
+    print(title.center(78) + os.linesep + ("=" * len(title)).center(78))
+    print("{0:18} {1:>14} {2:>12} {3:>9} {4:>9} {5:>8} {6:>8}".
+          format("Function", "Bytes", "'du' Diff", "Median", "p95",
+                 "Syscalls", "vs prev"))
+    for name, _ in FUNCTIONS:
+        res = results["functions"][name]
+        if "error" in res:
+            print("{0:18} {1}".format(name, res["error"]))
+            continue
+        syscalls = res["syscalls"]["total"] if res["syscalls"] else "n/a"
+        try:
+            prev = previous["functions"][name]["warm"]["median"]
+            ratio = "{0:7.2f}x".format(res["warm"]["median"] / prev)
+        except (TypeError, KeyError, ZeroDivisionError):
+            ratio = "n/a"
+        print("{0:18} {1:14} {2:>12} {3:8.4f}s {4:8.4f}s {5:>8} {6:>8}".
+              format(name, res["bytes"], "n/a" if res["du_diff"] is None
+                     else res["du_diff"], res["warm"]["median"],
+                     res["warm"]["p95"], syscalls, ratio))
+        if res["cold"]:
+            print("{0:>18} {1:>27} {2:8.4f}s {3:8.4f}s".
+                  format("(cold)", "", res["cold"]["median"],
+                         res["cold"]["p95"]))
+    print("")
+
+
+def main():
+    """Main section"""
+    args = arguments().parse_args()
+    results = {"version": get_size.__version__,
+               "python": platform.python_version(),
+               "platform": platform.platform(),
+               "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "repeat": args.repeat, "seed": args.seed, "trees": {}}
+    previous = {}
+    if args.compare:
+        with open(args.compare) as prev_file:
+            previous = json.load(prev_file)["trees"]
+    if args.cold and not drop_caches():
+        print("The page cache can't be dropped, only warm results")
+        print("")
+        args.cold = False
+
+    if args.path:
+        trees = {args.path: None}
+    else:
+        trees = dict((shape, SHAPES[shape]) for shape in
+                     (args.shapes or sorted(SHAPES)))
+    for tree, shape in sorted(trees.items()):
+        tmp_dir = tempfile.mkdtemp(prefix="get_size_bench_") if shape else None
+        try:
+            the_path = os.path.join(tmp_dir, tree) if shape else tree
+            entries = (make_tree(the_path, seed=args.seed, **shape) if shape
+                       else None)
+            res = bench_tree(the_path, args.repeat, args.cold, args.strace)
+            res["shape"], res["entries"] = shape, entries
+            results["trees"][tree] = res
+            report("{0} ({1} entries)".format(tree, entries) if shape
+                   else tree, res, previous.get(tree))
+        finally:
+            shutil.rmtree(tmp_dir) if tmp_dir else None
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
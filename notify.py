@@ -74,7 +74,7 @@ def notify(title, msg, icon=None, wrap=None):
         note = pynotify.Notification(title, msg, icon)
     try:
         note.show()
-    except Exception, e:
+    except Exception as e:
         print(e)
 
 
@@ -11,6 +11,14 @@
 # set of duplicates is left intact, and this script not try by any way
 # to discern which one is the original, it simply preserves the first
 # one in chronological order.
+#
+# The files are only read when they could be duplicates. Only the files of
+# the same size are compared, first by the start & the end of each one, and
+# only those that are still alike are read whole.
+#
+# Several paths can be given, and their whole trees walked, to find the
+# duplicates among all of them. The files are read by a pool of threads, as
+# many as the storage can serve at once.
 # =============================================================================
 
 # =============================================================================
@@ -33,14 +41,28 @@
 __author__ = "joe di castro <joe@joedicastro.com>"
 __license__ = "GNU General Public License version 3"
 __date__ = "2015-08-19"
-__version__ = "0.1"
+__version__ = "0.2"
 
 try:
-    import glob
+    import fnmatch
     import hashlib
     import os
+    import sqlite3
     import sys
-    from argparse import ArgumentParser
+    import tempfile
+    import time
+    from argparse import ArgumentParser, ArgumentTypeError
+    from concurrent.futures import ThreadPoolExecutor
+    try:
+        from os import scandir
+    except ImportError:
+        # Python 2 needs the backport of os.scandir (pip install scandir)
+        from scandir import scandir
+    try:
+        # Optional, a fast non-cryptographic hash
+        import xxhash
+    except ImportError:
+        xxhash = None
 except ImportError:
     # Checks the installation of the necessary python modules
     print((os.linesep * 2).join(["An error found importing one module:",
@@ -48,17 +70,47 @@ except ImportError:
     sys.exit(-2)
 
 
+def _kib(value):
+    """Get a buffer size in KiB from the command line, at least 1."""
+    kib = int(value)
+    if kib < 1:
+        raise ArgumentTypeError("the buffer must be at least 1 KiB")
+    return kib
+
+
 def arguments():
     """Defines the command line arguments for the script."""
-    cur_dir = os.path.curdir
     main_desc = """Remove all duplicate files leaving only one copy."""
-    usage = "%(prog)s [-p SRC] [-e EXT] [-t] [-vv] [--help]"
+    usage = ("%(prog)s [-p SRC] [-e EXT] [-r] [-w N] [-H HASH] [-c] [-b KIB] "
+             "[-t] [-vv] [--help]\n       %(prog)s bench [-s MIB] [-n N] "
+             "[-b KIB]")
 
     parser = ArgumentParser(description=main_desc, usage=usage)
-    parser.add_argument("-p", "--path", dest="path", default=cur_dir,
-                        help="the path. Current dir if none is provided")
+    parser.add_argument("-p", "--path", dest="paths", action="append",
+                        help="the path. Current dir if none is provided. Can "
+                        "be repeated, the duplicates are found among all "
+                        "the paths")
     parser.add_argument("-e", "--ext", dest="ext", default="*",
                         help="filter by file extension")
+    parser.add_argument("-r", "--recursive", dest="recursive",
+                        action="store_true",
+                        help="find the files in the whole tree of each path")
+    parser.add_argument("-w", "--workers", dest="workers", type=int,
+                        default=4,
+                        help="the files read at once (4 by default). Use 1 "
+                        "for a single spinning disk, more for SSDs or RAID")
+    parser.add_argument("-H", "--hash", dest="hash", default="md5",
+                        choices=sorted(HASHES),
+                        help="the hash algorithm (md5 by default). Measure "
+                        "them in this host with the 'bench' command")
+    parser.add_argument("-c", "--cache", dest="cache", action="store_true",
+                        help="keep the hashes of the files in a database "
+                        "(.dup_hashes.db), the files not modified since the "
+                        "last run are not read again")
+    parser.add_argument("-b", "--buffer", dest="buffer", type=_kib,
+                        default=BUFFER_SIZE // 1024,
+                        help="the KiB read at once from each file (1024 by "
+                        "default)")
     parser.add_argument("-t", "--test", dest="test", action="store_true",
                         help="test the result without delete anything")
     parser.add_argument("-vv", "--verbose", dest="verbose",
@@ -70,40 +122,387 @@ def arguments():
     return parser
 
 
+def bench_arguments():
+    """Defines the command line arguments for the bench command."""
+    main_desc = """Measure the speed of each hash algorithm in this host."""
+
+    parser = ArgumentParser(prog="remove_duplicates.py bench",
+                            description=main_desc)
+    parser.add_argument("-s", "--size", dest="size", type=int, default=256,
+                        help="the MiB of the file hashed (256 by default)")
+    parser.add_argument("-n", "--repeat", dest="repeat", type=int,
+                        default=3,
+                        help="hash it this many times, the best one counts "
+                        "(3 by default)")
+    parser.add_argument("-b", "--buffer", dest="buffer", type=_kib,
+                        default=BUFFER_SIZE // 1024,
+                        help="the KiB read at once from the file (1024 by "
+                        "default)")
+    return parser
+
+
+# The hash algorithms available, each one makes a new hash object. BLAKE2b is
+# truncated to 128 bits, the same as MD5, that is enough to compare files and
+# faster to store. xxHash is not cryptographic, a file crafted to collide with
+# another one could be deleted as its duplicate
+HASHES = {"md5": hashlib.md5, "sha1": hashlib.sha1}
+if hasattr(hashlib, "blake2b"):
+    HASHES["blake2b"] = lambda: hashlib.blake2b(digest_size=16)
+# Each one named as its function, thus the digests of one are never taken
+# as those of other (e.g. in the cache) whatever the version of xxhash
+if xxhash is not None:
+    HASHES["xxh64"] = xxhash.xxh64
+    if hasattr(xxhash, "xxh3_128"):
+        HASHES["xxh3_128"] = xxhash.xxh3_128
+CRYPTOGRAPHIC = ("md5", "sha1", "blake2b")
+
+
+# The bytes read from the start & from the end of a file to compare it with the
+# files of the same size, before reading them whole
+EDGE_SIZE = 16 * 1024
+# The bytes read at once to hash a whole file. Large reads are faster, but
+# each one needs its buffer in memory
+BUFFER_SIZE = 1024 * 1024
+
+
+def _map(pool, func, items):
+    """Get a list of func applied to each item, in the pool if any."""
+    return list(pool.map(func, items) if pool else map(func, items))
+
+
+def _split(groups, get_keys):
+    """Split each group of paths by a key, keep the parts of several paths.
+
+    (list) groups -- The lists of paths
+    (function) get_keys -- Get the list of the keys of a list of paths, all
+                           of them are got at once. The paths whose key is
+                           None (e.g. can't be read) are left out
+
+    """
+    keys = iter(get_keys([path for group in groups for path in group]))
+    parts = []
+    for group in groups:
+        same_key = {}
+        for path in group:
+            key = next(keys)
+            if key is not None:
+                same_key.setdefault(key, []).append(path)
+        parts.extend(part for part in same_key.values() if len(part) > 1)
+    return parts
+
+
+def _hashes(paths, hash_file, kind, stats, cache=None, pool=None):
+    """Get the hash of each file, reading only those not in the cache.
+
+    The files not in the cache are read in the pool if any, and then stored
+    in the cache. The hash of a file that can't be read is None.
+
+    """
+    def read_hash(path):
+        """Get the hash of a file, None if it can't be read."""
+        try:
+            return hash_file(path)
+        except (IOError, OSError):
+            # Removed or not readable since it was found
+            return None
+
+    hashes = [cache.get(stats[path], kind) if cache else None
+              for path in paths]
+    missing = [path for path, digest in zip(paths, hashes) if digest is None]
+    digests = iter(_map(pool, read_hash, missing))
+    for number, path in enumerate(paths):
+        if hashes[number] is None:
+            hashes[number] = next(digests)
+            if cache and hashes[number] is not None:
+                cache.put(stats[path], kind, hashes[number])
+    return hashes
+
+
+class HashCache:
+    """Create a HashCache object that stores the hashes of files in a file.
+
+    The cache is a sqlite database, the files are stored by their device &
+    inode, and their hashes are only valid while their size, mtime & ctime
+    are the same. The ctime can't be set by the users (unlike the mtime, that
+    cp -p, rsync -a or tar keep), thus a new file in the inode of a deleted
+    one never gets its hash.
+
+    """
+
+    # The time resolution of some filesystems is coarse, so a file modified
+    # in the same instant it's read could look unchanged later
+    racy_secs = 2
+
+    # The layout of the table, a database of other version is discarded
+    version = 2
+
+    def __init__(self, filename=".dup_hashes.db"):
+        """Create the object HashCache itself & open (or create) the database.
+
+        (str) filename -- The file of the sqlite database
+
+        """
+        self.filename = filename
+        self.__db = sqlite3.connect(filename)
+        if self.__db.execute("PRAGMA user_version").fetchone()[0] != \
+                self.version:
+            self.__db.execute("DROP TABLE IF EXISTS hashes")
+            self.__db.execute("PRAGMA user_version = {0:d}".format(
+                self.version))
+        self.__db.execute("CREATE TABLE IF NOT EXISTS hashes (dev INTEGER, "
+                          "ino INTEGER, kind TEXT, size INTEGER, mtime "
+                          "INTEGER, ctime INTEGER, hash TEXT, PRIMARY KEY "
+                          "(dev, ino, kind))")
+
+    @staticmethod
+    def __times(file_stat):
+        """Get the most precise mtime & ctime available in a stat result."""
+        return (getattr(file_stat, "st_mtime_ns", file_stat.st_mtime),
+                getattr(file_stat, "st_ctime_ns", file_stat.st_ctime))
+
+    def get(self, file_stat, kind):
+        """Get the hash stored of a file, None if it's unknown or modified.
+
+        (stat_result) file_stat -- The current stat of the file
+        (str) kind -- The kind of hash (e.g. of the whole file or its edges)
+
+        """
+        row = self.__db.execute("SELECT size, mtime, ctime, hash FROM hashes "
+                                "WHERE dev = ? AND ino = ? AND kind = ?",
+                                (file_stat.st_dev, file_stat.st_ino,
+                                 kind)).fetchone()
+        if row is None or tuple(row[:3]) != ((file_stat.st_size,) +
+                                             self.__times(file_stat)):
+            return None
+        return row[3]
+
+    def put(self, file_stat, kind, digest):
+        """Store the hash of a file, got after the stat.
+
+        (stat_result) file_stat -- The stat of the file before it was read
+        (str) kind -- The kind of hash
+        (str) digest -- The hash
+
+        """
+        # The ctime is never older than the mtime
+        if time.time() - file_stat.st_ctime < self.racy_secs:
+            return
+        self.__db.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, "
+                          "?, ?, ?)", (file_stat.st_dev, file_stat.st_ino,
+                                       kind, file_stat.st_size) +
+                          self.__times(file_stat) + (digest,))
+
+    def forget(self, file_stat):
+        """Remove all the hashes of a file (e.g. deleted)."""
+        self.__db.execute("DELETE FROM hashes WHERE dev = ? AND ino = ?",
+                          (file_stat.st_dev, file_stat.st_ino))
+
+    def commit(self):
+        """Save the changes in the database file."""
+        self.__db.commit()
+
+    def close(self):
+        """Save the changes & close the database file."""
+        self.__db.commit()
+        self.__db.close()
+
+
+def find_files(roots, pattern="*", recursive=False):
+    """Get the paths of the files whose name matches a pattern.
+
+    Like glob, the names that start with a dot only match a pattern that
+    starts with a dot too. The symbolic links are not followed, and the roots
+    that are the same directory as other one, or are in its tree if
+    recursive, are skipped, thus a file is never got twice. Like os.walk, the
+    directories that can't be listed are skipped.
+
+    (list) roots -- The directories where the files are
+    (str) pattern -- The pattern of the names, as in fnmatch
+    (bool) recursive -- Find them in the whole tree of each root
+
+    """
+    # Only the roots are resolved, the links below them are not followed
+    real_roots = [os.path.join(os.path.realpath(root), "") for root in roots]
+    found = []
+    for number, root in enumerate(roots):
+        real_root = real_roots[number]
+        if real_root in real_roots[:number] or (recursive and any(
+                real_root != other and real_root.startswith(other)
+                for other in real_roots)):
+            continue
+        stack = [root]
+        while stack:
+            try:
+                entries = sorted(scandir(stack.pop()),
+                                 key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and \
+                        fnmatch.fnmatch(entry.name, pattern) and not \
+                        (entry.name.startswith(".") and
+                         not pattern.startswith(".")):
+                    found.append(entry.path)
+            if recursive:
+                stack.extend(entry.path for entry in reversed(entries)
+                             if entry.is_dir(follow_symlinks=False))
+    return found
+
+
+def edge_hash(path, size, edge=EDGE_SIZE, algorithm="md5"):
+    """Get the hash of the start & the end of a file, as hexadecimal."""
+    a_hash = HASHES[algorithm]()
+    with open(path, "rb") as a_file:
+        a_hash.update(a_file.read(edge))
+        if size > edge:
+            a_file.seek(max(edge, size - edge))
+            a_hash.update(a_file.read(edge))
+    return a_hash.hexdigest()
+
+
+def full_hash(path, buffer_size=BUFFER_SIZE, algorithm="md5"):
+    """Get the hash of a whole file, as hexadecimal.
+
+    The file is read in chunks of buffer_size bytes into the same buffer,
+    thus the memory needed is the same whatever the size of the file.
+
+    """
+    if buffer_size <= 0:
+        raise ValueError("The buffer size must be positive: {0}".format(
+            buffer_size))
+    a_hash, buff = HASHES[algorithm](), bytearray(buffer_size)
+    view = memoryview(buff)
+    with open(path, "rb", 0) as a_file:
+        length = a_file.readinto(buff)
+        while length:
+            a_hash.update(view[:length])
+            length = a_file.readinto(buff)
+    return a_hash.hexdigest()
+
+
+def find_duplicates(paths, edge=EDGE_SIZE, buffer_size=BUFFER_SIZE,
+                    workers=1, cache=None, algorithm="md5"):
+    """Find the sets of files with the same content.
+
+    The files are compared in stages, each one only among the files still
+    alike: first by size, then by the hash of their start & end, and last by
+    the hash of the whole file. Thus a file is only read whole if there is
+    another one of its size with the same start & end.
+
+    (int) workers -- The files read at once, each one in its own thread.
+                     The result is the same whatever their number
+    (HashCache) cache -- Get from here the hashes of the files not modified
+                         since they were stored, and store the rest
+    (str) algorithm -- The name of the hash algorithm, one of HASHES
+
+    Return a list with the paths of each set of duplicates, sorted by their
+    ctime (the oldest first). The files that can't be stat'ed or read (e.g.
+    removed since they were found, or without permissions) are left out.
+
+    """
+    def get_stat(path):
+        """Get the stat of a file, None if it can't be stat'ed."""
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        stats = dict(zip(paths, _map(pool, get_stat, paths)))
+        same_size = _split([paths], lambda group: [
+            stats[path] and stats[path].st_size for path in group])
+        same_edges = _split(same_size, lambda group: _hashes(
+            group, lambda path: edge_hash(path, stats[path].st_size, edge,
+                                          algorithm),
+            "{0}:edge{1:d}".format(algorithm, edge), stats, cache, pool))
+        # The small files have been read whole already
+        duplicates = [group for group in same_edges
+                      if stats[group[0]].st_size <= 2 * edge]
+        duplicates.extend(_split(
+            [group for group in same_edges
+             if stats[group[0]].st_size > 2 * edge],
+            lambda group: _hashes(group, lambda path: full_hash(
+                path, buffer_size, algorithm), "{0}:full".format(algorithm),
+                stats, cache, pool)))
+    finally:
+        pool.shutdown() if pool else None
+        cache.commit() if cache else None
+    for group in duplicates:
+        group.sort(key=lambda path: (stats[path].st_ctime, path))
+    return duplicates
+
+
 def remove_dup_files(args, count=0):
-    """Remove duplicate files in a directory."""
-    os.chdir(args.path)
-    filtered = glob.glob("*.{0}".format(args.ext))
-    unique, total = set(), len(filtered)
+    """Remove duplicate files in some directories or their trees."""
+    filtered = find_files(args.paths or [os.path.curdir],
+                          "*.{0}".format(args.ext), args.recursive)
+    total = len(filtered)
 
     # Even when MD5 is fundamentally broken for cryptographic uses, in
-    # this particular case the risk of a collision is minimal and the
-    # performance is good enough, specially compared with other more
-    # accurate algorithms. Despite that, the risk of a collision
-    # exists, thus use it with caution!
-    files = {
-        i: {
-            "time": os.stat(i).st_ctime,
-            "path": os.path.join(args.path, i),
-            "hash": hashlib.md5(open(i).read()).hexdigest()
-        } for i in filtered
-    }
-
-    for i in sorted(files, key=lambda x: files[x]["time"]):
-        if files[i]["hash"] in unique:
-            os.remove(files[i]["path"]) if not args.test else None
+    # this particular case the risk of a collision is minimal. Despite that,
+    # the risk of a collision exists, thus use it with caution! The speed of
+    # each algorithm in this host is measured by the bench command
+    cache = HashCache(".dup_hashes.db") if args.cache else None
+    for duplicates in find_duplicates(filtered, buffer_size=args.buffer * 1024,
+                                      workers=args.workers, cache=cache,
+                                      algorithm=args.hash):
+        for path in duplicates[1:]:
+            if not args.test:
+                try:
+                    cache.forget(os.stat(path)) if cache else None
+                    os.remove(path)
+                except OSError:
+                    # Removed or not removable since it was compared
+                    continue
             if args.verbose:
-                print(files[i]["path"])
+                print(path)
             count += 1
-        unique.add(files[i]["hash"])
+    cache.close() if cache else None
 
     log = "Deleted {0} duplicate files from {1} files.".format(count, total)
     return log
 
 
+def bench_hashes(args):
+    """Measure the MiB/s of each hash algorithm hashing a file.
+
+    The file is read before, thus it's in the page cache and the speed of
+    the disk is not measured, only the speed of each algorithm with the same
+    reads of full_hash.
+
+    """
+    handle, temp_name = tempfile.mkstemp(prefix=".dup_bench")
+    try:
+        with os.fdopen(handle, "wb") as bench_file:
+            chunk = os.urandom(1024 * 1024)
+            for _ in range(args.size):
+                bench_file.write(chunk)
+        full_hash(temp_name, args.buffer * 1024)
+        rows = []
+        for algorithm in sorted(HASHES):
+            best = None
+            for _ in range(max(1, args.repeat)):
+                start = time.time()
+                full_hash(temp_name, args.buffer * 1024, algorithm)
+                lapse = time.time() - start
+                best = lapse if best is None else min(best, lapse)
+            rows.append((args.size / max(best, 1e-9), algorithm))
+    finally:
+        os.remove(temp_name)
+    return os.linesep.join(
+        " {0:10.1f} MiB/s   {1}{2}".format(speed, algorithm, "" if algorithm
+                                           in CRYPTOGRAPHIC else
+                                           " (not cryptographic)")
+        for speed, algorithm in sorted(rows, reverse=True))
+
+
 def main():
     """Main section"""
-    print(remove_dup_files(arguments().parse_args()))
+    if sys.argv[1:2] == ["bench"]:
+        print(bench_hashes(bench_arguments().parse_args(sys.argv[2:])))
+    else:
+        print(remove_dup_files(arguments().parse_args()))
 
 
 if __name__ == "__main__":
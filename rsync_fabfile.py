@@ -33,6 +33,7 @@ import tarfile
 import time
 from get_size import get_size as _get_size
 from get_size import best_unit_size as _best_unit_size
+from get_size import SizeCache as _SizeCache
 from logger import Logger as _logger
 from notify import notify as _notify
 from fabric.api import env, local
@@ -48,6 +49,13 @@ env.host_string = "username@host"
 env.remote = "/your/remote/path"
 env.local = "/your/local/path"
 env.use_ssh_config = True
+# A file to cache the sizes of the local directories between runs, e.g.
+# os.path.expanduser("~/.rsync_sizes.db"). Only the directories modified since
+# the last run are listed again. By default (None) the whole local path is
+# walked each time. Do not use it with rsync --inplace or --append, the files
+# rewritten in place do not change the mtime of their directory and their new
+# size is not seen
+env.size_cache = None
 
 # If wants to use various hosts, then define the previous variables like this,
 # one function per host.
@@ -150,7 +158,9 @@ def _get_diskspace():
     gz_size = sum([_get_size(gz) for gz in glob.glob('{0}*.gz'.
                                                      format(env.local))])
     log_size = _get_size(LOG.filename) if os.path.exists(LOG.filename) else 0
-    local_size = _get_size(env.local)
+    cache = _SizeCache(env.size_cache) if env.size_cache else None
+    local_size = _get_size(env.local, cache)
+    cache.close() if cache else None
     size = _best_unit_size(local_size + gz_size + log_size)
     LOG.block('Disk space used', '{0:>76.2f} {1}'.format(size['s'], size['u']))
 